@@ -5,6 +5,7 @@
 
 import os
 import logging
+import socket
 
 # 配置日志
 logging.basicConfig(
@@ -17,42 +18,205 @@ logger = logging.getLogger(__name__)
 # 设置时区为中国标准时间
 os.environ["TZ"] = "Asia/Shanghai"
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    jsonify,
+    session,
+    redirect,
+    url_for,
+    g,
+    has_app_context,
+)
 from flask_session import Session
-import sqlite3
+from werkzeug.http import generate_etag
 from datetime import datetime, timedelta
 from functools import wraps
-import hashlib
-import smtplib
+import base64
+import json
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
-import threading
 import time
+from itertools import groupby, islice
+from operator import itemgetter
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 from config import Config
+from mailer import SMTPPool
+from outbox import EmailOutbox, compact_outbox, create_outbox_table
+from lease import LeaderLease, create_lease_table
+from sessions import SQLiteSessionInterface, create_session_table
+from auth import (
+    AuthCache,
+    ResetTokenStore,
+    create_auth_tables,
+    create_reset_token_table,
+)
+from passwords import PasswordHasher, PasswordHasherBusy
+from stream import ChangeBroker
+from jsonstream import iter_page, row_encoder
+from emails import render_email
+from repository import (
+    CREDENTIALS_BY_USERNAME_QUERY,
+    TODO_RETURNING,
+    TODOS_BY_DATE_QUERY,
+    TODOS_BY_USER_QUERY,
+    TODOS_OPEN_QUERY,
+    USER_BY_EMAIL_QUERY,
+    USER_BY_ID_QUERY,
+    USER_SUMMARY_QUERY,
+    Credentials,
+    Todo,
+    User,
+    UserSummary,
+    select,
+    select_one,
+    todos_by_ids_query,
+)
+from search import (
+    create_todo_search,
+    create_user_search,
+    parse_terms,
+    search_todos,
+    user_search_condition,
+)
+from db import (
+    CLAIM_REMINDERS_QUERY,
+    DUE_REMINDERS_QUERY,
+    TODO_CHANGES_QUERY,
+    ConnectionPool,
+    ForkSafeWorker,
+    compact_reminder_ledger,
+    compact_todo_changes,
+    create_indexes,
+    create_reminder_ledger,
+    create_reminder_schedule,
+    create_todo_changes,
+    create_todo_revisions,
+    create_todo_stats,
+    create_todo_versions,
+    get_change_horizon,
+    get_change_seq,
+    get_todo_revision,
+    open_todos_query,
+    reminder_users_query,
+)
 
 # 初始化 Flask 应用
 app = Flask(__name__)
 app.config.from_object(Config)
 app.secret_key = Config.SECRET_KEY
 
+# 数据库文件名
+DB_NAME = Config.DB_NAME
+os.makedirs(os.path.dirname(DB_NAME) or ".", exist_ok=True)
+
+# 数据库连接池（每个工作进程一个，fork 后自动重建）
+db_pool = ConnectionPool(
+    DB_NAME,
+    max_size=Config.DB_POOL_SIZE,
+    timeout=Config.DB_BUSY_TIMEOUT / 1000,
+    statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+    pragmas=[
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("mmap_size", Config.DB_MMAP_SIZE),
+        ("cache_size", Config.DB_CACHE_SIZE),
+        ("busy_timeout", Config.DB_BUSY_TIMEOUT),
+        ("foreign_keys", "ON"),
+    ],
+)
+
 # 配置 Flask-Session（服务器端会话存储）
-app.config["SESSION_TYPE"] = "filesystem"  # 使用文件系统存储会话
 app.config["SESSION_PERMANENT"] = False  # 会话在浏览器关闭后过期
 app.config["SESSION_USE_SIGNER"] = True  # 对会话cookie进行签名
-app.config["SESSION_KEY_PREFIX"] = "todo_session_"  # 会话文件前缀
-Session(app)
+app.config["SESSION_KEY_PREFIX"] = "todo_session_"  # 会话键前缀
+session_pool = None
+if Config.SESSION_BACKEND == "sqlite":
+    # 会话使用独立的数据库文件，会话写入不与业务数据争抢写锁
+    os.makedirs(os.path.dirname(Config.SESSION_DB_NAME) or ".", exist_ok=True)
+    session_pool = ConnectionPool(
+        Config.SESSION_DB_NAME,
+        max_size=Config.DB_POOL_SIZE,
+        timeout=Config.DB_BUSY_TIMEOUT / 1000,
+        statement_cache_size=16,
+        pragmas=[
+            ("journal_mode", "WAL"),
+            ("synchronous", "NORMAL"),
+            ("busy_timeout", Config.DB_BUSY_TIMEOUT),
+        ],
+    )
+    app.session_interface = SQLiteSessionInterface(
+        app,
+        session_pool,
+        key_prefix=app.config["SESSION_KEY_PREFIX"],
+        use_signer=app.config["SESSION_USE_SIGNER"],
+        permanent=app.config["SESSION_PERMANENT"],
+        cache_size=Config.SESSION_CACHE_SIZE,
+        cache_ttl=Config.SESSION_CACHE_TTL,
+        gc_interval=Config.SESSION_GC_INTERVAL,
+    )
+else:
+    app.config["SESSION_TYPE"] = "filesystem"  # 使用文件系统存储会话
+    Session(app)
+
+# SMTP 会话池（复用已登录的连接批量发送邮件）
+smtp_pool = SMTPPool(
+    Config.MAIL_SERVER,
+    Config.MAIL_PORT,
+    username=Config.MAIL_USERNAME,
+    password=Config.MAIL_PASSWORD,
+    use_tls=Config.MAIL_USE_TLS,
+    max_size=Config.MAIL_POOL_SIZE,
+    max_messages_per_connection=Config.MAIL_MAX_MESSAGES_PER_CONNECTION,
+    idle_timeout=Config.MAIL_IDLE_TIMEOUT,
+    timeout=Config.MAIL_TIMEOUT,
+)
 
-# 数据库文件名
-DB_NAME = "todos.db"
+# 用户身份与角色缓存（管理接口鉴权）
+auth_cache = AuthCache(
+    db_pool,
+    ttl=Config.AUTH_CACHE_TTL,
+    version_check_interval=Config.AUTH_VERSION_CHECK_INTERVAL,
+)
 
-# 邮件提醒定时任务状态
-REMINDER_SCHEDULER_STARTED = False  # 定时任务是否已启动
-REMINDER_SENT_TODAY = {}  # 记录今日已发送的邮件（避免重复发送）
+# 密码重置令牌（所有工作进程共享）
+reset_tokens = ResetTokenStore(
+    db_pool,
+    ttl=Config.RESET_TOKEN_TTL,
+    sweep_interval=Config.RESET_TOKEN_SWEEP_INTERVAL,
+)
+
+# 密码哈希（scrypt，在有界线程池中计算）
+password_hasher = PasswordHasher(
+    n=Config.PASSWORD_HASH_N,
+    r=Config.PASSWORD_HASH_R,
+    p=Config.PASSWORD_HASH_P,
+    max_workers=Config.PASSWORD_HASH_WORKERS,
+    max_pending=Config.PASSWORD_HASH_QUEUE,
+    timeout=Config.PASSWORD_HASH_TIMEOUT,
+)
+
+# 待办变更推送（每个进程一个轮询线程，分发给本进程的 SSE 连接）
+change_broker = ChangeBroker(
+    db_pool,
+    poll_interval=Config.STREAM_POLL_INTERVAL,
+    max_subscribers=Config.STREAM_MAX_CONNECTIONS,
+)
+
+# 提醒定时任务的主节点租约（所有进程中只有持有者执行提醒）
+reminder_lease = LeaderLease(
+    db_pool, "reminder-scheduler", ttl=Config.SCHEDULER_LEASE_TTL
+)
+
+# 列表接口分页大小（默认值 / 上限）
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
 
 
 def cors_response(response):
@@ -93,6 +257,15 @@ def after_request(response):
     return cors_response(response)
 
 
+@app.errorhandler(PasswordHasherBusy)
+def handle_password_hasher_busy(error):
+    """密码哈希排队已满时返回 503，由客户端稍后重试"""
+    logger.warning(f"密码哈希繁忙: {error}")
+    response = jsonify({"error": "服务器繁忙，请稍后重试"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.route("/api/options", methods=["OPTIONS"])
 def handle_options():
     response = jsonify({"status": "ok"})
@@ -103,16 +276,33 @@ def get_db_connection():
     """
     获取数据库连接
     返回一个支持字典式访问的 SQLite 连接对象
+    请求内多次调用返回同一个连接，请求结束时归还连接池；
+    请求外（如定时任务）从连接池借出，调用 close() 即归还
     """
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    if not has_app_context():
+        return db_pool.acquire()
+
+    conn = g.get("db_conn")
+    if conn is None:
+        conn = db_pool.acquire()
+        conn.request_scoped = True
+        g.db_conn = conn
     return conn
 
 
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """请求结束时把请求级连接归还连接池"""
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        db_pool.release(conn)
+
+
 def init_db():
     """
     初始化数据库
-    创建用户表和待办事项表（如果不存在）
+    创建用户表和待办事项表（如果不存在）、热点查询索引、待办计数表、待办变更日志、全文索引、邮件发件箱、租约表、用户版本号表、重置令牌表和会话表，
+    并为尚未排期的用户计算下一次提醒时间
     """
     conn = get_db_connection()
     conn.execute(
@@ -125,7 +315,8 @@ def init_db():
             is_admin INTEGER DEFAULT 0,
             reminder_time INTEGER DEFAULT 540,
             created_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime')),
-            last_login_at TIMESTAMP
+            last_login_at TIMESTAMP,
+            next_reminder_at TIMESTAMP
         )
     """
     )
@@ -139,20 +330,50 @@ def init_db():
             created_date DATE,
             created_at TIMESTAMP,
             user_id INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
     """
     )
+    create_todo_versions(conn)
+    if not create_indexes(conn):
+        logger.warning("users 表中存在重复邮箱，email 唯一索引未创建")
+    create_todo_stats(conn)
+    create_todo_revisions(conn)
+    create_todo_changes(conn)
+    create_todo_search(conn)
+    create_user_search(conn)
+    create_outbox_table(conn)
+    create_reminder_schedule(conn)
+    backfill_reminder_schedule(conn)
+    create_reminder_ledger(conn)
+    create_lease_table(conn)
+    create_auth_tables(conn)
+    create_reset_token_table(conn)
     conn.commit()
     conn.close()
 
+    if session_pool is not None:
+        conn = session_pool.acquire()
+        create_session_table(conn)
+        conn.commit()
+        conn.close()
+
 
 def hash_password(password):
     """
     密码加密函数
-    使用 SHA-256 算法对密码进行哈希处理
+    使用 scrypt 生成加盐哈希，代价参数见 PASSWORD_HASH_* 配置
     """
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
+
+
+def verify_password(password, stored):
+    """
+    校验密码
+    同时支持 scrypt 哈希和旧版 SHA-256 哈希
+    """
+    return password_hasher.verify(password, stored)
 
 
 def login_required(f):
@@ -173,7 +394,8 @@ def login_required(f):
 def admin_required(f):
     """
     管理员装饰器
-    用于保护需要管理员权限才能访问的路由
+    用于保护需要管理员权限才能访问的路由，
+    角色使用 auth_cache 缓存，命中时不查询数据库
     """
 
     @wraps(f)
@@ -181,12 +403,8 @@ def admin_required(f):
         if "user_id" not in session:
             return jsonify({"error": "请先登录"}), 401
 
-        conn = get_db_connection()
-        user = conn.execute(
-            "SELECT is_admin FROM users WHERE id = ?", (session["user_id"],)
-        ).fetchone()
-        conn.close()
-
+        # 角色从进程内缓存读取，用户变更时通过版本号失效
+        user = auth_cache.get_user(session["user_id"])
         if not user or user["is_admin"] != 1:
             return jsonify({"error": "需要管理员权限"}), 403
 
@@ -195,32 +413,219 @@ def admin_required(f):
     return decorated_function
 
 
-def send_email(to_email, subject, html_content):
+def encode_cursor(created_at, row_id):
+    """
+    生成分页游标
+    游标对客户端不透明，内容为最后一行的 (created_at, id)
+    """
+    raw = json.dumps([created_at, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    解析分页游标
+    :return: (created_at, id)，游标非法时抛出 ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError("无效的分页游标")
+    return created_at, row_id
+
+
+def get_page_args():
+    """
+    读取请求中的分页参数 limit 和 cursor
+    :return: (limit, cursor)，cursor 为 None 表示第一页；参数非法时抛出 ValueError
+    """
+    limit = request.args.get("limit", PAGE_SIZE_DEFAULT, type=int)
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    token = request.args.get("cursor", "").strip()
+    cursor = decode_cursor(token) if token else None
+    return limit, cursor
+
+
+def list_etag(*parts):
+    """
+    根据决定列表内容的数据（用户ID、待办修改计数、查询参数等）生成强 ETag
+    同一 URL 的 ETag 不变即表示响应内容不变
+    """
+    return generate_etag(repr(parts).encode())
+
+
+def query_key():
     """
-    发送邮件函数
+    请求的查询参数（按名称排序），作为列表 ETag 的一部分
+    视图、日期、分页等参数不同时响应内容不同，ETag 也必须不同
+    """
+    return tuple(sorted(request.args.items(multi=True)))
+
+
+def not_modified(etag):
+    """
+    请求的 If-None-Match 与 etag 匹配时返回 304 响应，否则返回 None
+    """
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return None
+
+
+def cacheable(response, etag):
+    """为列表响应设置 ETag，浏览器每次使用缓存前都要重新验证"""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def page_query(query, params, limit, cursor=None):
+    """
+    生成键集分页查询，按 (created_at, id) 倒序，多取一行用于判断是否有下一页
+    :param query: 不含排序和 LIMIT 的查询语句，必须已包含 WHERE 子句
+    :return: (查询语句, 参数列表)
+    """
+    params = list(params)
+    if cursor:
+        query += " AND (created_at, id) < (?, ?)"
+        params.extend(cursor)
+
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    return query, params
+
+
+def page_cursor(row):
+    """根据本页最后一条记录生成下一页游标"""
+    return encode_cursor(row.created_at, row.id)
+
+
+def fetch_page(conn, record, query, params, limit, cursor=None):
+    """
+    键集分页查询，按 (created_at, id) 倒序
+    :param record: 结果记录类型，查询的列须与其字段一致
+    :param query: 不含排序和 LIMIT 的查询语句，必须已包含 WHERE 子句
+    :return: (本页记录列表, 下一页游标)，没有下一页时游标为 None
+    """
+    rows = select(conn, record, *page_query(query, params, limit, cursor)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = page_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def stream_page(conn, query, params, limit, cursor, encode_row, head=None):
+    """
+    待办的键集分页查询，以流式 JSON 返回 {<head>, "todos": [...], "next_cursor": ...}
+    连接由响应持有，在响应发送完毕（或客户端断开）后归还连接池，
+    因此必须直接从 db_pool 借出，不能使用请求级连接
+    """
+    rows = select(conn, Todo, *page_query(query, params, limit, cursor))
+    response = app.response_class(
+        iter_page(rows, encode_row, limit, page_cursor, head=head),
+        mimetype="application/json",
+    )
+    response.call_on_close(conn.close)
+    return response
+
+
+# 待办的 JSON 编码：用户自己的列表包含版本号（用于 If-Match），管理后台的列表不包含
+TODO_FIELDS = [
+    ("id", "id", None),
+    ("title", "title", None),
+    ("description", "description", None),
+    ("completed", "completed", bool),
+    ("created_date", "created_date", None),
+    ("created_at", "created_at", None),
+]
+encode_todo = row_encoder(Todo, TODO_FIELDS + [("version", "version", None)])
+encode_admin_todo = row_encoder(Todo, TODO_FIELDS)
+
+# 带计数的分页最多统计的行数
+PAGE_COUNT_LIMIT = 1000
+
+
+def fetch_page_with_count(conn, record, query, params, limit, cursor=None, prefix=""):
+    """
+    键集分页查询，同时统计从本页起的匹配行数
+    匹配行按 (created_at, id) 倒序最多取 PAGE_COUNT_LIMIT 行，由窗口函数在同一次查询中计数，
+    不需要另外执行一次 COUNT 查询
+    :param record: 结果记录类型，查询的列须与其字段一致
+    :param prefix: 排序列的表名前缀（如 "users."），用于含 JOIN 的查询
+    :return: (本页记录列表, 下一页游标, 从本页起的匹配行数，不超过 PAGE_COUNT_LIMIT)
+    """
+    params = list(params)
+    if cursor:
+        query += f" AND ({prefix}created_at, {prefix}id) < (?, ?)"
+        params.extend(cursor)
+
+    query = f"""
+        SELECT *, COUNT(*) OVER () AS match_count FROM (
+            {query} ORDER BY +{prefix}created_at DESC, {prefix}id DESC LIMIT ?
+        ) ORDER BY created_at DESC, id DESC LIMIT ?
+    """
+    params += [PAGE_COUNT_LIMIT, limit + 1]
+    # 计数附在每行末尾，取出后再构造记录
+    rows = conn.execute(query, params).fetchall()
+
+    count = rows[0][-1] if rows else 0
+    rows = [record._make(row[:-1]) for row in rows]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = page_cursor(rows[-1])
+    return rows, next_cursor, count
+
+
+def mail_configured():
+    """邮件服务是否已启用并配置了账号"""
+    return bool(
+        Config.MAIL_ENABLED and Config.MAIL_USERNAME and Config.MAIL_PASSWORD
+    )
+
+
+def deliver_email(to_email, subject, html_content, smtp=None):
+    """
+    构建并投递一封邮件，失败时抛出异常
+    :param smtp: 已借出的 SMTP 会话（批量发送时复用），为空时从会话池借用
+    """
+    msg = MIMEMultipart("alternative")
+    msg["From"] = formataddr(("待办事项提醒", Config.MAIL_DEFAULT_SENDER))
+    msg["To"] = to_email
+    msg["Subject"] = subject
+
+    html_part = MIMEText(html_content, "html", "utf-8")
+    msg.attach(html_part)
+
+    if smtp is None:
+        smtp_pool.send(msg)
+    else:
+        smtp.send(msg)
+
+
+def send_email(to_email, subject, html_content, smtp=None):
+    """
+    发送邮件函数（同步发送）
     :param to_email: 收件人邮箱
     :param subject: 邮件主题
     :param html_content: 邮件HTML内容
+    :param smtp: 已借出的 SMTP 会话（批量发送时复用），为空时从会话池借用
     :return: 发送成功返回 True，失败返回 False
     """
-    if not Config.MAIL_ENABLED or not Config.MAIL_USERNAME or not Config.MAIL_PASSWORD:
+    if not mail_configured():
         logger.warning("邮件服务未配置或未启用")
         return False
 
     try:
-        msg = MIMEMultipart("alternative")
-        msg["From"] = formataddr(("待办事项提醒", Config.MAIL_DEFAULT_SENDER))
-        msg["To"] = to_email
-        msg["Subject"] = subject
-
-        html_part = MIMEText(html_content, "html", "utf-8")
-        msg.attach(html_part)
-
-        with smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT) as server:
-            server.starttls()
-            server.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
-            server.send_message(msg)
-
+        deliver_email(to_email, subject, html_content, smtp)
         logger.info(f"邮件已发送至: {to_email}")
         return True
     except Exception as e:
@@ -228,23 +633,41 @@ def send_email(to_email, subject, html_content):
         return False
 
 
-def generate_reset_token(user_id):
+# 邮件发件箱（请求内只入队，由后台线程投递、失败重试）
+email_outbox = EmailOutbox(
+    db_pool,
+    deliver_email,
+    smtp_pool.session,
+    batch_size=Config.OUTBOX_BATCH_SIZE,
+    max_attempts=Config.OUTBOX_MAX_ATTEMPTS,
+    retry_base=Config.OUTBOX_RETRY_BASE,
+    poll_interval=Config.OUTBOX_POLL_INTERVAL,
+    claim_timeout=Config.OUTBOX_CLAIM_TIMEOUT,
+)
+
+
+def queue_email(conn, to_email, subject, html_content):
     """
-    生成密码重置令牌
-    :param user_id: 用户ID
-    :return: 重置令牌
+    把邮件加入发件箱，由后台投递线程发送（不阻塞当前请求）
+    :param conn: 调用方持有的连接（请求中为请求级连接），写入时一并提交其中未提交的修改
+    :return: 加入成功返回 True，邮件服务未配置时返回 False
     """
-    import secrets
+    if not mail_configured():
+        logger.warning("邮件服务未配置或未启用")
+        return False
 
-    token = secrets.token_urlsafe(32)
-    RESET_TOKENS[token] = {
-        "user_id": user_id,
-        "expires": datetime.now().timestamp() + 3600,
-    }
-    return token
+    email_outbox.enqueue(conn, to_email, subject, html_content)
+    return True
 
 
-RESET_TOKENS = {}
+def generate_reset_token(conn, user_id):
+    """
+    生成密码重置令牌（不提交事务）
+    令牌摘要保存在 reset_tokens 表中，任何工作进程都能验证
+    :param user_id: 用户ID
+    :return: 重置令牌
+    """
+    return reset_tokens.issue(conn, user_id)
 
 
 @app.route("/forgot-password", methods=["GET"])
@@ -265,12 +688,12 @@ def reset_password_page(token):
     重置密码页面
     :param token: 重置令牌
     """
-    token_data = RESET_TOKENS.get(token)
+    token_data = reset_tokens.lookup(token)
     if not token_data:
         return render_template("reset_password.html", error="链接无效或已过期")
 
-    if datetime.now().timestamp() > token_data["expires"]:
-        del RESET_TOKENS[token]
+    _, expired = token_data
+    if expired:
         return render_template("reset_password.html", error="链接已过期")
 
     return render_template("reset_password.html", token=token)
@@ -284,52 +707,26 @@ def forgot_password():
     if not email or "@" not in email:
         return jsonify({"error": "请提供有效的邮箱地址"}), 400
 
+    # 令牌和邮件写入请求级连接，在同一事务中提交；邮件服务未配置时令牌随请求回滚
     conn = get_db_connection()
-    user = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
-    conn.close()
+    user = select_one(conn, User, USER_BY_EMAIL_QUERY, (email,))
 
     if not user:
+        conn.close()
         return jsonify({"message": "如果邮箱存在，已发送重置链接"}), 200
 
-    token = generate_reset_token(user["id"])
+    token = generate_reset_token(conn, user.id)
     reset_link = f"http://localhost:5145/reset-password/{token}"
 
-    html_content = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; padding: 20px; }}
-            .container {{ max-width: 600px; margin: 0 auto; }}
-            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .btn {{ display: inline-block; padding: 12px 30px; background: #667eea; color: white; text-decoration: none; border-radius: 8px; margin: 20px 0; }}
-            .footer {{ text-align: center; color: #999; margin-top: 20px; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🔐 密码重置</h1>
-            </div>
-            <div class="content">
-                <p>您好，{user['username']}！</p>
-                <p>我们收到了您的密码重置请求。请点击下方按钮重置密码：</p>
-                <p style="text-align: center;">
-                    <a href="{reset_link}" class="btn">重置密码</a>
-                </p>
-                <p>或者复制以下链接到浏览器：</p>
-                <p style="word-break: break-all; color: #667eea;">{reset_link}</p>
-                <p style="color: #999;">此链接有效期为1小时，请尽快完成密码重置。</p>
-            </div>
-            <div class="footer">
-                <p>此邮件由系统自动发送，请勿回复。</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-    success = send_email(email, "待办事项系统 - 密码重置", html_content)
+    html_content = render_email(
+        "password_reset.html",
+        username=user.username,
+        reset_link=reset_link,
+        ttl_minutes=Config.RESET_TOKEN_TTL // 60,
+    )
+
+    success = queue_email(conn, email, "待办事项系统 - 密码重置", html_content)
+    conn.close()
 
     if success:
         return jsonify({"message": "如果邮箱存在，已发送重置链接"})
@@ -349,228 +746,439 @@ def reset_password():
     if len(new_password) < 6:
         return jsonify({"error": "密码长度至少6个字符"}), 400
 
-    token_data = RESET_TOKENS.get(token)
-    if not token_data:
+    if not reset_tokens.lookup(token):
         return jsonify({"error": "链接无效或已过期"}), 400
 
-    if datetime.now().timestamp() > token_data["expires"]:
-        del RESET_TOKENS[token]
-        return jsonify({"error": "链接已过期"}), 400
-
-    user_id = token_data["user_id"]
     hashed_password = hash_password(new_password)
 
+    # 删除令牌和修改密码在同一事务中完成，同一令牌只能使用一次
     conn = get_db_connection()
+    token_data = reset_tokens.consume(conn, token)
+    if not token_data:
+        conn.close()
+        return jsonify({"error": "链接无效或已过期"}), 400
+
+    user_id, expired = token_data
+    if expired:
+        conn.commit()
+        conn.close()
+        return jsonify({"error": "链接已过期"}), 400
+
     conn.execute(
         "UPDATE users SET password = ? WHERE id = ?", (hashed_password, user_id)
     )
+    # 密码已重置，该用户的其他重置链接一并作废
+    reset_tokens.revoke_user(conn, user_id)
+    auth_cache.bump(conn)
     conn.commit()
     conn.close()
 
-    del RESET_TOKENS[token]
-
     return jsonify({"message": "密码重置成功"})
 
 
-def format_time_ago(created_at_str):
+def minutes_label(minutes):
+    """把一天中的分钟数格式化为 HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def next_reminder_slot(reminder_time, after):
     """
-    格式化时间差，显示已过去多久
+    计算用户在 after 之后的下一个提醒时间
+    每天从用户设置的 reminder_time 开始，每隔 REMINDER_INTERVAL_MINUTES 分钟提醒一次，
+    直到 REMINDER_END_TIME（提醒时间晚于结束时间时，当天只提醒一次）
+    :param reminder_time: 每日首次提醒时间（一天中的分钟数）
+    :param after: 起算时间
+    :return: 下一个提醒时间（datetime）
     """
-    try:
-        created_at = datetime.strptime(created_at_str, "%Y-%m-%d %H:%M:%S")
-        now = datetime.now()
-        diff = now - created_at
-
-        days = diff.days
-        hours = diff.seconds // 3600
-        minutes = (diff.seconds % 3600) // 60
-
-        if days > 0:
-            return f"{days}天前"
-        elif hours > 0:
-            return f"{hours}小时前"
-        elif minutes > 0:
-            return f"{minutes}分钟前"
-        else:
-            return "刚刚"
-    except:
-        return "未知"
+    start = reminder_time if reminder_time is not None else 540
+    end = max(Config.REMINDER_END_TIME, start)
+    interval = max(Config.REMINDER_INTERVAL_MINUTES, 1)
+
+    today = after.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = (after - today).total_seconds() / 60 - start
+    slot = start if elapsed < 0 else start + (int(elapsed // interval) + 1) * interval
+    if slot <= end:
+        return today + timedelta(minutes=slot)
+    return today + timedelta(days=1, minutes=start)
+
+
+def schedule_reminder(conn, user_id, reminder_time, after=None):
+    """
+    根据提醒时间更新用户的 next_reminder_at（不提交事务）
+    """
+    slot = next_reminder_slot(reminder_time, after or datetime.now())
+    conn.execute(
+        "UPDATE users SET next_reminder_at = ? WHERE id = ?",
+        (slot.strftime("%Y-%m-%d %H:%M:%S"), user_id),
+    )
+
+
+def backfill_reminder_schedule(conn):
+    """
+    为设置了邮箱但尚未排期的用户计算 next_reminder_at（不提交事务）
+    :return: 排期的用户数
+    """
+    users = conn.execute(
+        """
+        SELECT id, reminder_time FROM users
+        WHERE next_reminder_at IS NULL AND email IS NOT NULL AND email != ''
+        """
+    ).fetchall()
+    for user in users:
+        schedule_reminder(conn, user["id"], user["reminder_time"])
+    return len(users)
 
 
-def send_reminder_emails():
+def iter_open_todos_by_user(conn, user_ids, limit=None):
     """
-    发送邮件提醒
-    每天7:30-21:30每小时检查一次，通知用户未完成的待办事项
+    单次有序查询遍历一批用户的未完成待办
+    逐个产出 (用户ID, 未完成待办列表, 未完成待办总数)，没有未完成待办的用户不会产出；
+    列表最多保留 limit 条（其余只计数），内存占用与单个用户的待办数无关
     """
-    global REMINDER_SENT_TODAY
+    rows = conn.execute(open_todos_query(len(user_ids)), list(user_ids))
+    for user_id, group in groupby(rows, key=itemgetter("user_id")):
+        todos = list(islice(group, limit))
+        yield user_id, todos, len(todos) + sum(1 for _ in group)
+
 
+def send_reminder_emails(now=None, lease=None):
+    """
+    发送到期的邮件提醒
+    1. 领取：只处理 next_reminder_at 已到期的用户（按索引分批取出），
+       把 next_reminder_at 推进到下一个时段，同时在 reminder_ledger 中写入该时段的记录；
+       两者在同一事务中提交，(user_id, slot) 唯一保证同一时段只被领取一次
+    2. 发送：按批把 pending 记录原子地改为 sending（记录领取者和领取时间），只处理本批领取到的记录；
+       每个用户发送前刷新领取时间，发完立即提交状态作为检查点。
+       进程中途崩溃后，领取超过 OUTBOX_CLAIM_TIMEOUT 秒的记录恢复为 pending，由下一次运行继续；
+       已发送或已被其他进程重新领取的用户不会重发
+    :param lease: 主节点租约；每批开始前续约，失去主节点身份后停止，剩余的用户由新的主节点处理
+    :return: 发送的邮件数
+    """
     if not Config.MAIL_ENABLED:
-        return
+        return 0
 
-    logger.info("开始发送提醒邮件...")
+    now = now or datetime.now()
+    now_str = now.strftime("%Y-%m-%d %H:%M:%S")
 
-    conn = get_db_connection()
-    now = datetime.now()
-    current_date = now.strftime("%Y-%m-%d")
-    current_hour = now.hour
-    current_minute = now.minute
+    # 错过太久（如服务停机期间）的提醒只推进时段，不补发
+    grace = timedelta(minutes=Config.REMINDER_INTERVAL_MINUTES)
+    grace_start = (now - grace).strftime("%Y-%m-%d %H:%M:%S")
+    window_label = (
+        f"每天 %s 起每 {Config.REMINDER_INTERVAL_MINUTES} 分钟，"
+        f"至 {minutes_label(Config.REMINDER_END_TIME)}"
+    )
 
-    # 检查是否在通知时间范围内 (7:30-21:30)
-    # 7:30 开始，21:30 结束
-    is_before_start = current_hour < 7 or (current_hour == 7 and current_minute < 30)
-    is_after_end = current_hour > 21 or (current_hour == 21 and current_minute > 30)
+    def still_leader():
+        if lease is None or lease.try_acquire():
+            return True
+        logger.warning("已失去主节点身份，停止发送提醒")
+        return False
 
-    if is_before_start or is_after_end:
-        logger.info(
-            f"当前时间 {current_hour}:{current_minute:02d} 不在通知时间范围内 (7:30-21:30)"
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    sent_count = 0
+    conn = get_db_connection()
+    try:
+        # 上次运行遗留、已超出补发时限的记录不再发送
+        conn.execute(
+            """
+            UPDATE reminder_ledger SET status = 'expired'
+            WHERE slot < ? AND status IN ('pending', 'sending')
+            """,
+            (grace_start,),
         )
+        # 领取后长时间未完成的记录视为发送进程已崩溃，恢复为待发送
+        conn.execute(
+            """
+            UPDATE reminder_ledger SET status = 'pending', claimed_by = NULL
+            WHERE slot >= ? AND status = 'sending' AND claimed_at < ?
+            """,
+            (grace_start, time.time() - Config.OUTBOX_CLAIM_TIMEOUT),
+        )
+        conn.commit()
+
+        while still_leader():
+            due_users = conn.execute(
+                DUE_REMINDERS_QUERY, (now_str, Config.REMINDER_BATCH_SIZE)
+            ).fetchall()
+            if not due_users:
+                break
+
+            # 推进下一个提醒时段；条件更新保证同一时段只被领取一次
+            for user in due_users:
+                cursor = conn.execute(
+                    """
+                    UPDATE users SET next_reminder_at = ?
+                    WHERE id = ? AND next_reminder_at = ?
+                    """,
+                    (
+                        next_reminder_slot(user["reminder_time"], now).strftime(
+                            "%Y-%m-%d %H:%M:%S"
+                        ),
+                        user["id"],
+                        user["next_reminder_at"],
+                    ),
+                )
+                if not cursor.rowcount:
+                    continue
+                status = (
+                    "pending" if user["next_reminder_at"] >= grace_start else "expired"
+                )
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO reminder_ledger
+                        (user_id, slot, status, created_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (user["id"], user["next_reminder_at"], status, now_str),
+                )
+            conn.commit()
+
+        while still_leader():
+            rows = conn.execute(
+                CLAIM_REMINDERS_QUERY,
+                (worker_id, time.time(), grace_start, Config.REMINDER_BATCH_SIZE),
+            ).fetchall()
+            conn.commit()
+            if not rows:
+                break
+
+            # 同一用户领取到多个时段时只发送最新的一个
+            claimed = {}
+            for row in sorted(rows, key=itemgetter("slot")):
+                previous = claimed.get(row["user_id"])
+                if previous is not None:
+                    mark_reminder(
+                        conn, row["user_id"], previous["slot"], "expired", worker_id
+                    )
+                claimed[row["user_id"]] = row
+            users = {
+                user["id"]: user
+                for user in conn.execute(
+                    reminder_users_query(len(claimed)), list(claimed)
+                )
+            }
+
+            # 整批提醒复用同一个 SMTP 会话，避免每封邮件都重新握手和登录
+            with smtp_pool.session() as smtp:
+                for user_id, todos, total in iter_open_todos_by_user(
+                    conn, claimed, Config.MAIL_MAX_TODO_ITEMS
+                ):
+                    # 已被删除的用户留在 claimed 中，按跳过处理
+                    if user_id not in users:
+                        continue
+                    row = claimed.pop(user_id)
+                    user = users[user_id]
+                    # 已超时并被其他进程重新领取的记录不再发送
+                    if not renew_reminder_claim(conn, user_id, row["slot"], worker_id):
+                        continue
+                    slot = datetime.strptime(row["slot"], "%Y-%m-%d %H:%M:%S")
+
+                    reminder_time = user["reminder_time"]
+                    if reminder_time is None:
+                        reminder_time = 540
+                    html_content = render_email(
+                        "reminder.html",
+                        username=user["username"],
+                        todos=todos,
+                        total=total,
+                        slot_label=f"{slot:%Y-%m-%d %H:%M}",
+                        window_label=window_label % minutes_label(reminder_time),
+                        now=now,
+                    )
+                    sent = send_email(
+                        user["email"],
+                        f"待办事项提醒 - {slot:%Y-%m-%d %H:%M}",
+                        html_content,
+                        smtp=smtp,
+                    )
+                    status = "sent" if sent else "failed"
+                    mark_reminder(conn, user_id, row["slot"], status, worker_id)
+                    if sent:
+                        sent_count += 1
+                        logger.info(
+                            f"✓ 已发送邮件给用户 {user['username']} (提醒时间: {slot:%H:%M})"
+                        )
+
+            # 没有未完成待办的用户不发送
+            for user_id, row in claimed.items():
+                mark_reminder(conn, user_id, row["slot"], "skipped", worker_id)
+    finally:
         conn.close()
-        return
 
-    # 新的一天，重置发送记录
-    last_reset = REMINDER_SENT_TODAY.get("date", "")
-    if last_reset != current_date:
-        REMINDER_SENT_TODAY = {"date": current_date}
-        logger.info("新的一天，重置发送记录")
+    if sent_count > 0:
+        logger.info(f"共发送 {sent_count} 封提醒邮件")
+    return sent_count
 
-    users = conn.execute(
-        "SELECT * FROM users WHERE email IS NOT NULL AND email != ''"
-    ).fetchall()
 
-    sent_count = 0
+def renew_reminder_claim(conn, user_id, slot, worker_id):
+    """
+    发送前刷新提醒时段的领取时间并立即提交
+    :return: 该时段仍由 worker_id 领取时返回 True
+    """
+    cursor = conn.execute(
+        """
+        UPDATE reminder_ledger SET claimed_at = ?
+        WHERE user_id = ? AND slot = ? AND status = 'sending' AND claimed_by = ?
+        """,
+        (time.time(), user_id, slot, worker_id),
+    )
+    conn.commit()
+    return cursor.rowcount == 1
 
-    for user in users:
-        user_id = user["id"]
-        sent_key = f"{current_date}_{user_id}_{current_hour}"
-        if REMINDER_SENT_TODAY.get(sent_key):
-            continue
 
-        # 获取未完成的待办事项
-        todos = conn.execute(
-            "SELECT * FROM todos WHERE user_id = ? AND completed = 0 ORDER BY created_at DESC",
-            (user["id"],),
-        ).fetchall()
+def mark_reminder(conn, user_id, slot, status, worker_id):
+    """
+    记录一个提醒时段的处理结果并立即提交（发送进度的检查点）
+    只更新仍由 worker_id 领取的记录
+    :param status: sent / failed / skipped / expired
+    """
+    cursor = conn.execute(
+        """
+        UPDATE reminder_ledger SET status = ?, sent_at = ?
+        WHERE user_id = ? AND slot = ? AND status = 'sending' AND claimed_by = ?
+        """,
+        (
+            status,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            user_id,
+            slot,
+            worker_id,
+        ),
+    )
+    conn.commit()
+    if cursor.rowcount == 0:
+        logger.warning(f"提醒时段已被重新领取: 用户 {user_id} ({slot})")
 
-        if todos:
-            # 构建待办事项列表，包含创建时间和已过去时间
-            todo_items_html = ""
-            for todo in todos:
-                created_at = todo["created_at"]
-                time_ago = format_time_ago(created_at)
-                todo_items_html += f"""
-                <div class="todo-item">
-                    <div class="todo-title">{todo["title"]}</div>
-                    <div class="todo-meta">
-                        <span class="todo-date">创建于: {created_at}</span>
-                        <span class="time-ago">已过去: {time_ago}</span>
-                    </div>
-                </div>
-                """
 
-            html_content = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #4A90D9 0%, #67B8DE 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-                    .greeting {{ font-size: 24px; margin-bottom: 20px; }}
-                    .todo-list {{ background: white; padding: 20px; border-radius: 8px; margin: 20px 0; }}
-                    .todo-item {{ padding: 15px 0; border-bottom: 1px solid #eee; }}
-                    .todo-item:last-child {{ border-bottom: none; }}
-                    .todo-title {{ font-weight: 600; font-size: 16px; margin-bottom: 8px; }}
-                    .todo-meta {{ font-size: 13px; color: #666; }}
-                    .todo-date {{ margin-right: 15px; }}
-                    .time-ago {{ color: #e74c3c; font-weight: 500; }}
-                    .footer {{ text-align: center; color: #999; margin-top: 30px; font-size: 12px; }}
-                    .notification-time {{ background: #fff3cd; padding: 10px; border-radius: 6px; margin-bottom: 20px; font-size: 14px; color: #856404; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>📋 待办事项提醒</h1>
-                    </div>
-                    <div class="content">
-                        <p class="greeting">你好，{user['username']}！</p>
-                        <div class="notification-time">
-                            ⏰ 当前时间: {now.strftime("%Y-%m-%d %H:%M")} | 提醒时段: 07:00-23:00
-                        </div>
-                        <p>您共有 <strong>{len(todos)}</strong> 个待办事项未完成：</p>
-                        <div class="todo-list">
-                            {todo_items_html}
-                        </div>
-                        <p style="margin-top: 20px;">点击 <a href="http://localhost:5145">这里</a> 查看和管理您的待办事项。</p>
-                    </div>
-                    <div class="footer">
-                        <p>此邮件由系统自动发送，请勿回复。</p>
-                        <p>每日提醒时间: 07:00 - 23:00 (每小时检查一次)</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+def compact_reminder_history():
+    """
+    清理超过保留天数的提醒发送记录
+    :return: 删除的记录数
+    """
+    before = datetime.now() - timedelta(days=Config.REMINDER_LEDGER_RETENTION_DAYS)
+    conn = get_db_connection()
+    try:
+        deleted = compact_reminder_ledger(conn, before.strftime("%Y-%m-%d %H:%M:%S"))
+        conn.commit()
+    finally:
+        conn.close()
 
-            send_email(
-                user["email"],
-                f"待办事项提醒 - {current_date} {current_hour}:00",
-                html_content,
-            )
-            sent_count += 1
-            REMINDER_SENT_TODAY[sent_key] = True
-            logger.info(
-                f"✓ 已发送邮件给用户 {user['username']} (提醒时间: {current_hour}:00)"
-            )
+    if deleted:
+        logger.info(f"已清理 {deleted} 条过期的提醒发送记录")
+    return deleted
 
-    conn.close()
 
-    if sent_count > 0:
-        logger.info(f"共发送 {sent_count} 封提醒邮件")
-    else:
-        logger.info("没有需要发送的提醒邮件")
+def compact_outbox_history():
+    """
+    清理超过保留天数的已发送邮件
+    :return: 删除的记录数
+    """
+    before = time.time() - Config.OUTBOX_RETENTION_DAYS * 86400
+    conn = get_db_connection()
+    try:
+        deleted = compact_outbox(conn, before)
+        conn.commit()
+    finally:
+        conn.close()
 
+    if deleted:
+        logger.info(f"已清理 {deleted} 封过期的已发送邮件")
+    return deleted
 
-def start_reminder_scheduler():
+
+def compact_todo_history():
     """
-    启动邮件提醒定时任务
-    每隔1小时检查并发送邮件提醒
+    压缩待办变更日志：删除被覆盖的变更和超过保留天数的删除记录
+    :return: 删除的记录数
     """
-    global REMINDER_SCHEDULER_STARTED
-    if REMINDER_SCHEDULER_STARTED:
-        return
+    before = time.time() - Config.TODO_CHANGES_RETENTION_DAYS * 86400
+    conn = get_db_connection()
+    try:
+        deleted = compact_todo_changes(conn, before)
+        conn.commit()
+    finally:
+        conn.close()
 
-    REMINDER_SCHEDULER_STARTED = True
+    if deleted:
+        logger.info(f"已压缩 {deleted} 条待办变更记录")
+    return deleted
 
-    def scheduler():
-        while True:
-            now = datetime.now()
-            current_minute = now.minute
-            current_second = now.second
 
-            # 计算距离下一个整点（北京时间）的秒数
-            # 如果现在是 10:15:30，距离 11:00:00 还有 (44 * 60 + 30) = 2670 秒
-            seconds_to_next_hour = (59 - current_minute) * 60 + (60 - current_second)
+def seconds_until_next_reminder():
+    """
+    距离最早一个提醒时段的秒数
+    最长等待 REMINDER_MAX_SLEEP 秒，以便及时发现其他进程修改的提醒时间
+    """
+    # 邮件服务未启用时 send_reminder_emails 不推进到期时段，按到期时间计算会每秒轮询一次
+    if not Config.MAIL_ENABLED:
+        return Config.REMINDER_MAX_SLEEP
+
+    conn = get_db_connection()
+    try:
+        earliest = conn.execute(
+            "SELECT MIN(next_reminder_at) FROM users WHERE next_reminder_at IS NOT NULL"
+        ).fetchone()[0]
+    finally:
+        conn.close()
 
-            logger.info(
-                f"当前时间: {now.strftime('%H:%M:%S')}，距离下一个整点还有 {seconds_to_next_hour} 秒"
-            )
+    if not earliest:
+        return Config.REMINDER_MAX_SLEEP
+
+    delay = (
+        datetime.strptime(earliest, "%Y-%m-%d %H:%M:%S") - datetime.now()
+    ).total_seconds()
+    return min(max(delay, 1), Config.REMINDER_MAX_SLEEP)
 
-            # 等待到下一个整点
-            time.sleep(seconds_to_next_hour)
 
-            # 到达整点，执行邮件发送
+class ReminderScheduler(ForkSafeWorker):
+    """
+    邮件提醒定时任务
+    每个进程都运行一个调度线程，通过租约选出唯一的主节点执行提醒；
+    主节点休眠到最早的提醒时段，醒来后只处理到期的用户
+    """
+
+    thread_name = "reminder-scheduler"
+
+    def __init__(self, lease):
+        self.lease = lease
+        # 非主节点定期检查能否接管租约
+        self.standby_delay = max(lease.ttl / 3, 1)
+        self._register_fork_reset()
+
+    def _run(self):
+        compacted_date = None
+        while True:
+            if not self.lease.is_leader:
+                time.sleep(self.standby_delay)
+                continue
+
             try:
-                send_reminder_emails()
+                # 每天清理一次旧的提醒发送记录和已发送邮件，并压缩待办变更日志
+                today = datetime.now().date()
+                if compacted_date != today:
+                    compact_reminder_history()
+                    compact_outbox_history()
+                    compact_todo_history()
+                    compacted_date = today
+                send_reminder_emails(lease=self.lease)
+                delay = seconds_until_next_reminder()
             except Exception as e:
                 logger.error(f"定时任务执行失败: {e}")
+                delay = Config.REMINDER_MAX_SLEEP
 
-            # 等待1分钟，避免在同一分钟内重复执行
-            time.sleep(60)
+            time.sleep(min(delay, self.standby_delay))
 
-    thread = threading.Thread(target=scheduler, daemon=True)
-    thread.start()
-    logger.info("邮件提醒定时任务已启动")
+
+reminder_scheduler = ReminderScheduler(reminder_lease)
+
+
+def start_reminder_scheduler():
+    """
+    启动邮件提醒定时任务（每个进程只启动一次）
+    """
+    reminder_lease.start()
+    if reminder_scheduler.start():
+        logger.info("邮件提醒定时任务已启动")
 
 
 @app.route("/login")
@@ -659,11 +1267,16 @@ def register():
             "INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
             (username, hashed_password, email),
         )
-        conn.commit()
         user_id = cursor.lastrowid
+        schedule_reminder(conn, user_id, 540)
+        conn.commit()
         conn.close()
 
         return jsonify({"id": user_id, "username": username, "email": email}), 201
+    except PasswordHasherBusy:
+        # 交给 PasswordHasherBusy 的错误处理返回 503 和 Retry-After
+        conn.close()
+        raise
     except Exception as e:
         conn.close()
         return jsonify({"error": "注册失败"}), 500
@@ -680,35 +1293,49 @@ def login():
     password = data["password"]
 
     conn = get_db_connection()
-    user = conn.execute(
-        "SELECT * FROM users WHERE username = ?", (username,)
-    ).fetchone()
+    user = select_one(conn, Credentials, CREDENTIALS_BY_USERNAME_QUERY, (username,))
 
     if not user:
         conn.close()
         return jsonify({"error": "用户名或密码错误"}), 401
 
-    if user["password"] != hash_password(password):
+    if not verify_password(password, user.password):
         conn.close()
         return jsonify({"error": "用户名或密码错误"}), 401
 
+    # 旧格式或旧参数的哈希在登录成功后升级；新哈希在写入前计算，不在写事务中等待哈希线程池，
+    # 线程池繁忙时本次不升级，下次登录再升级
+    new_hash = None
+    if password_hasher.needs_rehash(user.password):
+        try:
+            new_hash = hash_password(password)
+        except PasswordHasherBusy:
+            pass
+
     conn.execute(
         "UPDATE users SET last_login_at = DATETIME('now', 'localtime') WHERE id = ?",
-        (user["id"],),
+        (user.id,),
     )
     conn.commit()
+    if new_hash is not None:
+        # 密码已被其他请求修改时不覆盖
+        conn.execute(
+            "UPDATE users SET password = ? WHERE id = ? AND password = ?",
+            (new_hash, user.id, user.password),
+        )
+        conn.commit()
     conn.close()
 
-    session["user_id"] = user["id"]
-    session["username"] = user["username"]
-    session["is_admin"] = user["is_admin"]
+    session["user_id"] = user.id
+    session["username"] = user.username
+    session["is_admin"] = user.is_admin
 
     return jsonify(
         {
-            "id": user["id"],
-            "username": user["username"],
-            "email": user["email"],
-            "is_admin": bool(user["is_admin"]),
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "is_admin": bool(user.is_admin),
         }
     )
 
@@ -776,6 +1403,7 @@ def update_reminder_time():
         "UPDATE users SET reminder_time = ? WHERE id = ?",
         (reminder_time, session["user_id"]),
     )
+    schedule_reminder(conn, session["user_id"], reminder_time)
     conn.commit()
     conn.close()
 
@@ -801,7 +1429,7 @@ def index():
     if session.get("is_admin"):
         return redirect("/admin")
 
-    return render_template("index.html")
+    return render_template("index.html", batch_max_operations=BATCH_MAX_OPERATIONS)
 
 
 @app.route("/api/todos", methods=["GET"])
@@ -809,51 +1437,80 @@ def index():
 def get_todos():
     """
     获取待办事项列表API
-    根据日期筛选返回用户的待办事项
+    根据日期筛选返回用户的待办事项，按创建时间倒序分页
     """
     try:
-        date = request.args.get("date")
-        view = request.args.get("view", "today")  # today 或 all
-        user_id = session["user_id"]
-        conn = get_db_connection()
+        limit, cursor = get_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    date = request.args.get("date")
+    view = request.args.get("view", "today")  # today 或 all
+    user_id = session["user_id"]
+    # 连接由流式响应持有到发送完毕，直接从连接池借出
+    conn = db_pool.acquire()
+    try:
+        # 待办没有变化时直接返回 304，不执行列表查询
+        etag = list_etag(
+            "todos", user_id, get_todo_revision(conn, user_id), query_key()
+        )
+        response = not_modified(etag)
+        if response is not None:
+            conn.close()
+            return response
 
         if date:
             # 指定日期的查询
-            todos = conn.execute(
-                "SELECT * FROM todos WHERE created_date = ? AND user_id = ? ORDER BY created_at DESC",
-                (date, user_id),
-            ).fetchall()
+            query = TODOS_BY_DATE_QUERY
+            params = (date, user_id)
         elif view == "all":
             # 所有待办（已完成 + 未完成）
-            todos = conn.execute(
-                "SELECT * FROM todos WHERE user_id = ? ORDER BY created_at DESC",
-                (user_id,),
-            ).fetchall()
+            query = TODOS_BY_USER_QUERY
+            params = (user_id,)
         else:
             # 默认只返回未完成的
-            todos = conn.execute(
-                "SELECT * FROM todos WHERE user_id = ? AND completed = 0 ORDER BY created_at DESC",
-                (user_id,),
-            ).fetchall()
+            query = TODOS_OPEN_QUERY
+            params = (user_id,)
 
+        response = stream_page(conn, query, params, limit, cursor, encode_todo)
+        return cacheable(response, etag)
+    except Exception as e:
         conn.close()
+        return jsonify({"error": str(e)}), 500
 
-        result = []
-        for todo in todos:
-            result.append(
-                {
-                    "id": todo["id"],
-                    "title": todo["title"],
-                    "description": todo["description"],
-                    "completed": bool(todo["completed"]),
-                    "created_date": todo["created_date"],
-                    "created_at": todo["created_at"],
-                }
-            )
 
-        return jsonify(result)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+@app.route("/api/todos/search", methods=["GET"])
+@login_required
+def search_todo_items():
+    """
+    搜索待办事项API
+    在当前用户的待办标题和描述中搜索同时包含所有关键词（空格分隔）的待办，按相关度分页；
+    cursor 为上一页返回的 next_cursor
+    """
+    terms = parse_terms(request.args.get("q", ""))
+    if not terms:
+        return jsonify({"error": "搜索关键词不能为空"}), 400
+    limit = request.args.get("limit", PAGE_SIZE_DEFAULT, type=int)
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    offset = max(request.args.get("cursor", 0, type=int), 0)
+
+    user_id = session["user_id"]
+    conn = get_db_connection()
+    try:
+        # 待办没有变化时同一搜索（关键词和分页参数相同）的结果不变
+        etag = list_etag(
+            "search", user_id, get_todo_revision(conn, user_id), query_key()
+        )
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        rows = search_todos(conn, user_id, terms, limit + 1, offset)
+    finally:
+        conn.close()
+
+    next_cursor = str(offset + limit) if len(rows) > limit else None
+    result = [todo.to_dict() for todo in rows[:limit]]
+    return cacheable(jsonify({"todos": result, "next_cursor": next_cursor}), etag)
 
 
 @app.route("/api/todos", methods=["POST"])
@@ -885,19 +1542,8 @@ def add_todo():
     todo_id = cursor.lastrowid
     conn.close()
 
-    return (
-        jsonify(
-            {
-                "id": todo_id,
-                "title": title,
-                "description": description,
-                "completed": False,
-                "created_date": created_date,
-                "created_at": created_at,
-            }
-        ),
-        201,
-    )
+    todo = Todo(todo_id, title, description, False, created_date, created_at, 1)
+    return jsonify(todo.to_dict()), 201
 
 
 @app.route("/api/todos/<int:todo_id>", methods=["PUT"])
@@ -905,53 +1551,63 @@ def add_todo():
 def update_todo(todo_id):
     """
     更新待办事项API
-    修改待办事项的完成状态
+    修改待办事项的完成状态、标题或描述
+    只修改请求中出现的字段，单条 UPDATE ... RETURNING 完成更新并返回结果；
+    请求带 If-Match 时只有版本号匹配才会更新，否则返回 412
     """
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    # 与批量接口的更新操作使用同一套校验
+    error = validate_batch_operation({**data, "op": "update", "id": todo_id})
+    if error:
+        return jsonify({"error": error}), 400
     user_id = session["user_id"]
 
-    conn = get_db_connection()
-    todo = conn.execute(
-        "SELECT * FROM todos WHERE id = ? AND user_id = ?", (todo_id, user_id)
-    ).fetchone()
-
-    if not todo:
-        conn.close()
-        return jsonify({"error": "待办事项不存在"}), 404
-
+    assignments = []
+    params = []
     if "completed" in data:
-        conn.execute(
-            "UPDATE todos SET completed = ? WHERE id = ?",
-            (1 if data["completed"] else 0, todo_id),
-        )
-
+        assignments.append("completed = ?")
+        params.append(1 if data["completed"] else 0)
     if "title" in data:
-        conn.execute(
-            "UPDATE todos SET title = ? WHERE id = ?", (data["title"].strip(), todo_id)
-        )
-
+        assignments.append("title = ?")
+        params.append(data["title"].strip())
     if "description" in data:
-        conn.execute(
-            "UPDATE todos SET description = ? WHERE id = ?",
-            (data["description"].strip(), todo_id),
-        )
+        assignments.append("description = ?")
+        params.append(data["description"].strip())
+
+    query = f"""
+        UPDATE todos SET {", ".join(assignments)}, version = version + 1
+        WHERE id = ? AND user_id = ?
+    """
+    params += [todo_id, user_id]
+
+    # If-Match: 客户端持有的版本号（ETag 为 "版本号"）
+    if request.if_match and not request.if_match.star_tag:
+        versions = [int(tag) for tag in request.if_match.as_set() if tag.isdigit()]
+        if not versions:
+            return jsonify({"error": "待办事项已被修改，请刷新后重试"}), 412
+        query += f" AND version IN ({', '.join('?' * len(versions))})"
+        params += versions
+
+    conn = get_db_connection()
+    updated_todo = select_one(conn, Todo, query + TODO_RETURNING, params)
+    if not updated_todo:
+        # 未更新时再区分待办不存在和版本冲突
+        exists = conn.execute(
+            "SELECT 1 FROM todos WHERE id = ? AND user_id = ?", (todo_id, user_id)
+        ).fetchone()
+        conn.close()
+        if not exists:
+            return jsonify({"error": "待办事项不存在"}), 404
+        return jsonify({"error": "待办事项已被修改，请刷新后重试"}), 412
 
     conn.commit()
-    updated_todo = conn.execute(
-        "SELECT * FROM todos WHERE id = ?", (todo_id,)
-    ).fetchone()
     conn.close()
 
-    return jsonify(
-        {
-            "id": updated_todo["id"],
-            "title": updated_todo["title"],
-            "description": updated_todo["description"],
-            "completed": bool(updated_todo["completed"]),
-            "created_date": updated_todo["created_date"],
-            "created_at": updated_todo["created_at"],
-        }
-    )
+    response = jsonify(updated_todo.to_dict())
+    response.set_etag(str(updated_todo.version))
+    return response
 
 
 @app.route("/api/todos/<int:todo_id>", methods=["DELETE"])
@@ -975,6 +1631,298 @@ def delete_todo(todo_id):
     return jsonify({"message": "删除成功"})
 
 
+# 批量接口单次最多执行的操作数
+BATCH_MAX_OPERATIONS = 500
+
+
+def validate_batch_operation(op):
+    """
+    校验批量接口中的单个操作
+    :return: 错误信息，合法时返回 None
+    """
+    if not isinstance(op, dict):
+        return "操作格式错误"
+
+    kind = op.get("op")
+    if kind == "create":
+        title = op.get("title")
+        if not isinstance(title, str) or not title.strip():
+            return "标题不能为空"
+        if not isinstance(op.get("description", ""), str):
+            return "描述格式错误"
+        return None
+
+    if kind not in ("update", "delete"):
+        return "不支持的操作类型"
+    todo_id = op.get("id")
+    if not isinstance(todo_id, int) or isinstance(todo_id, bool):
+        return "缺少待办事项 ID"
+    if kind == "update":
+        if not any(field in op for field in ("completed", "title", "description")):
+            return "没有需要更新的字段"
+        title = op.get("title", "-")
+        if not isinstance(title, str) or not title.strip():
+            return "标题不能为空"
+        if not isinstance(op.get("description", ""), str):
+            return "描述格式错误"
+    return None
+
+
+@app.route("/api/todos/batch", methods=["POST"])
+@login_required
+def batch_todos():
+    """
+    批量修改待办事项API
+    请求体：{"operations": [{"op": "create" | "update" | "delete", ...}, ...]}
+    所有操作在同一个事务中执行，同类操作合并为一次 executemany；
+    按请求顺序返回每个操作的结果，不存在的待办事项返回 404，其余操作照常执行。
+    任一操作格式错误时整批不执行
+    """
+    data = request.get_json(silent=True)
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "operations 不能为空"}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return (
+            jsonify({"error": f"单次最多 {BATCH_MAX_OPERATIONS} 个操作"}),
+            400,
+        )
+
+    errors = [
+        {"index": index, "status": 400, "error": error}
+        for index, error in enumerate(map(validate_batch_operation, operations))
+        if error
+    ]
+    if errors:
+        return jsonify({"error": "存在格式错误的操作", "results": errors}), 400
+
+    user_id = session["user_id"]
+    now = datetime.now()
+    created_date = now.strftime("%Y-%m-%d")
+    created_at = now.strftime("%Y-%m-%d %H:%M:%S")
+
+    conn = get_db_connection()
+    try:
+        # 立即获取写锁，保证下面的存在性检查与写入看到同一份数据
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+        target_ids = {op["id"] for op in operations if op["op"] != "create"}
+        existing = set()
+        if target_ids:
+            placeholders = ", ".join("?" * len(target_ids))
+            existing = {
+                row["id"]
+                for row in conn.execute(
+                    f"SELECT id FROM todos WHERE user_id = ? AND id IN ({placeholders})",
+                    (user_id, *target_ids),
+                )
+            }
+
+        # 按请求顺序确定每个操作的结果（先删除再更新同一条时，更新返回 404）
+        results = [None] * len(operations)
+        creates, updates, deletes = [], [], []
+        for index, op in enumerate(operations):
+            if op["op"] == "create":
+                creates.append(
+                    (
+                        index,
+                        (
+                            op["title"].strip(),
+                            op.get("description", "").strip(),
+                            user_id,
+                            created_date,
+                            created_at,
+                        ),
+                    )
+                )
+            elif op["id"] not in existing:
+                results[index] = {
+                    "index": index,
+                    "status": 404,
+                    "error": "待办事项不存在",
+                }
+            elif op["op"] == "update":
+                completed = op.get("completed")
+                updates.append(
+                    (
+                        index,
+                        (
+                            None if completed is None else (1 if completed else 0),
+                            op["title"].strip() if "title" in op else None,
+                            op["description"].strip() if "description" in op else None,
+                            op["id"],
+                            user_id,
+                        ),
+                    )
+                )
+            else:
+                existing.discard(op["id"])
+                deletes.append((index, (op["id"], user_id)))
+
+        if creates:
+            conn.executemany(
+                """
+                INSERT INTO todos (title, description, user_id, created_date, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [params for _, params in creates],
+            )
+            # 写事务中没有其他写入者，本批插入的 ID 连续递增
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(creates) + 1
+            for offset, (index, params) in enumerate(creates):
+                todo = Todo(
+                    first_id + offset,
+                    params[0],
+                    params[1],
+                    False,
+                    created_date,
+                    created_at,
+                    1,
+                )
+                results[index] = {"index": index, "status": 201, "todo": todo.to_dict()}
+
+        if updates:
+            conn.executemany(
+                """
+                UPDATE todos SET
+                    completed = COALESCE(?, completed),
+                    title = COALESCE(?, title),
+                    description = COALESCE(?, description),
+                    version = version + 1
+                WHERE id = ? AND user_id = ?
+                """,
+                [params for _, params in updates],
+            )
+
+        if deletes:
+            conn.executemany(
+                "DELETE FROM todos WHERE id = ? AND user_id = ?",
+                [params for _, params in deletes],
+            )
+            for index, params in deletes:
+                results[index] = {"index": index, "status": 200, "id": params[0]}
+
+        # 返回更新后的待办事项（同一批中随后被删除的只返回 ID）
+        updated = {}
+        if updates:
+            updated_ids = tuple({params[3] for _, params in updates})
+            updated = {
+                todo.id: todo
+                for todo in select(
+                    conn, Todo, todos_by_ids_query(len(updated_ids)), updated_ids
+                )
+            }
+        for index, params in updates:
+            result = {"index": index, "status": 200, "id": params[3]}
+            todo = updated.get(params[3])
+            if todo is not None:
+                result["todo"] = todo.to_dict()
+            results[index] = result
+
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"批量修改待办事项失败: {e}")
+        return jsonify({"error": "批量操作失败"}), 500
+    finally:
+        conn.close()
+
+    return jsonify({"results": results})
+
+
+# 增量同步每次最多返回的变更数
+CHANGES_PAGE_SIZE = 500
+
+
+@app.route("/api/todos/changes", methods=["GET"])
+@login_required
+def get_todo_changes():
+    """
+    待办增量同步API
+    返回序号 since 之后新增、修改（upsert，附带完整待办）和删除（delete，只有 ID）的待办，
+    同一待办只返回最新状态；不带 since 时只返回当前序号，作为全量加载前的同步起点。
+    since 早于已压缩的日志时返回 410，客户端需要全量重新加载
+    """
+    since = request.args.get("since")
+    user_id = session["user_id"]
+    conn = get_db_connection()
+    try:
+        # 先读取当前序号再查询，查询期间提交的变更留到下一次同步
+        cursor = get_change_seq(conn)
+        if since is None:
+            return jsonify({"changes": [], "cursor": cursor, "has_more": False})
+
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"error": "since 参数格式错误"}), 400
+        if since < get_change_horizon(conn):
+            return jsonify({"error": "同步记录已过期，请重新加载", "reset": True}), 410
+
+        rows = conn.execute(
+            TODO_CHANGES_QUERY, (user_id, since, cursor, CHANGES_PAGE_SIZE, user_id)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    changes = []
+    for row in rows:
+        if row["id"] is None:
+            changes.append({"seq": row["seq"], "op": "delete", "id": row["todo_id"]})
+            continue
+        # 变更序号和待办 ID 之后依次是待办的各列
+        todo = Todo._make(row[2:])
+        changes.append({"seq": row["seq"], "op": "upsert", "todo": todo.to_dict()})
+
+    # 未取完时从本页最后一条继续，否则直接跳到当前序号
+    has_more = len(rows) == CHANGES_PAGE_SIZE
+    if has_more:
+        cursor = rows[-1]["seq"]
+    return jsonify({"changes": changes, "cursor": max(cursor, since), "has_more": has_more})
+
+
+@app.route("/api/stream", methods=["GET"])
+@login_required
+def stream_changes():
+    """
+    待办变更推送（Server-Sent Events）
+    用户的待办有变化时推送 changes 事件（data 为最新的变更序号），客户端收到后调用增量同步接口；
+    空闲时定期发送心跳注释。连接只占用一个线程，不持有数据库连接；
+    本进程连接数已满时返回 503，客户端稍后重连
+    """
+    subscription = change_broker.subscribe(session["user_id"])
+    if subscription is None:
+        response = jsonify({"error": "推送连接过多，请稍后重试"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    def generate():
+        try:
+            # 断开后浏览器 3 秒后自动重连
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + Config.STREAM_MAX_DURATION
+            while time.monotonic() < deadline:
+                seq = subscription.wait(Config.STREAM_HEARTBEAT_INTERVAL)
+                if seq is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: changes\ndata: {json.dumps({'cursor': seq})}\n\n"
+        finally:
+            subscription.close()
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 禁止 Nginx 等反向代理缓冲事件
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @app.route("/admin")
 def admin_page():
     """
@@ -993,60 +1941,50 @@ def admin_page():
 @app.route("/api/admin/users", methods=["GET"])
 @admin_required
 def get_users():
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 10, type=int)
+    try:
+        limit, cursor = get_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     search = request.args.get("search", "").strip()
 
     conn = get_db_connection()
 
-    query = "SELECT * FROM users WHERE 1=1"
+    # 待办数量来自触发器维护的 todo_stats，一次查询取回整页
+    query = USER_SUMMARY_QUERY
     params = []
 
     if search:
-        query += " AND (username LIKE ? OR email LIKE ?)"
-        params.extend([f"%{search}%", f"%{search}%"])
-
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    params.extend([per_page, (page - 1) * per_page])
-
-    users = conn.execute(query, params).fetchall()
-
-    count_query = "SELECT COUNT(*) FROM users WHERE 1=1"
-    count_params = []
-    if search:
-        count_query += " AND (username LIKE ? OR email LIKE ?)"
-        count_params.extend([f"%{search}%", f"%{search}%"])
-
-    total = conn.execute(count_query, count_params).fetchone()[0]
-    conn.close()
-
-    result = []
-    for user in users:
-        temp_conn = get_db_connection()
-        todo_count = temp_conn.execute(
-            "SELECT COUNT(*) FROM todos WHERE user_id = ?", (user["id"],)
-        ).fetchone()[0]
-        temp_conn.close()
-
-        result.append(
-            {
-                "id": user["id"],
-                "username": user["username"],
-                "email": user["email"],
-                "is_admin": bool(user["is_admin"]),
-                "created_at": user["created_at"],
-                "last_login_at": user["last_login_at"],
-                "todo_count": todo_count,
-            }
+        # 搜索时匹配数在同一次查询中统计（见 fetch_page_with_count），最多统计 PAGE_COUNT_LIMIT 条。
+        # 只在第一页（不带游标）返回：翻页时从游标起的计数逐页减少，客户端沿用第一页的值
+        condition, params = user_search_condition(search)
+        users, next_cursor, count = fetch_page_with_count(
+            conn,
+            UserSummary,
+            query + f" WHERE {condition}",
+            params,
+            limit,
+            cursor,
+            "users.",
         )
+        if cursor is None:
+            total, estimated = count, count >= PAGE_COUNT_LIMIT
+        else:
+            total = estimated = None
+    else:
+        users, next_cursor = fetch_page(
+            conn, UserSummary, query + " WHERE 1=1", params, limit, cursor
+        )
+        total = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        estimated = False
+    conn.close()
 
     return jsonify(
         {
-            "users": result,
+            "users": [user.to_dict() for user in users],
             "total": total,
-            "page": page,
-            "per_page": per_page,
-            "total_pages": (total + per_page - 1) // per_page,
+            "estimated": estimated,
+            "limit": limit,
+            "next_cursor": next_cursor,
         }
     )
 
@@ -1054,43 +1992,36 @@ def get_users():
 @app.route("/api/admin/users/<int:user_id>", methods=["GET"])
 @admin_required
 def get_user_detail(user_id):
-    conn = get_db_connection()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    try:
+        limit, cursor = get_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 连接由流式响应持有到发送完毕，直接从连接池借出
+    conn = db_pool.acquire()
+    user = select_one(conn, User, USER_BY_ID_QUERY, (user_id,))
 
     if not user:
         conn.close()
         return jsonify({"error": "用户不存在"}), 404
 
-    todos = conn.execute(
-        "SELECT * FROM todos WHERE user_id = ? ORDER BY created_at DESC",
-        (user_id,),
-    ).fetchall()
-    conn.close()
-
-    todo_list = []
-    for todo in todos:
-        todo_list.append(
-            {
-                "id": todo["id"],
-                "title": todo["title"],
-                "description": todo["description"],
-                "completed": bool(todo["completed"]),
-                "created_date": todo["created_date"],
-                "created_at": todo["created_at"],
-            }
-        )
+    # 响应包含用户信息，ETag 同时取决于这些字段和待办修改计数
+    etag = list_etag("user", get_todo_revision(conn, user_id), query_key(), *user)
+    response = not_modified(etag)
+    if response is not None:
+        conn.close()
+        return response
 
-    return jsonify(
-        {
-            "id": user["id"],
-            "username": user["username"],
-            "email": user["email"],
-            "is_admin": bool(user["is_admin"]),
-            "created_at": user["created_at"],
-            "last_login_at": user["last_login_at"],
-            "todos": todo_list,
-        }
+    response = stream_page(
+        conn,
+        TODOS_BY_USER_QUERY,
+        (user_id,),
+        limit,
+        cursor,
+        encode_admin_todo,
+        head=user.to_dict(),
     )
+    return cacheable(response, etag)
 
 
 @app.route("/api/admin/users", methods=["POST"])
@@ -1141,8 +2072,10 @@ def create_user():
             "INSERT INTO users (username, password, email, is_admin) VALUES (?, ?, ?, ?)",
             (username, hashed_password, email, 1 if is_admin else 0),
         )
-        conn.commit()
         user_id = cursor.lastrowid
+        schedule_reminder(conn, user_id, 540)
+        auth_cache.bump(conn)
+        conn.commit()
         conn.close()
 
         return (
@@ -1156,6 +2089,10 @@ def create_user():
             ),
             201,
         )
+    except PasswordHasherBusy:
+        # 交给 PasswordHasherBusy 的错误处理返回 503 和 Retry-After
+        conn.close()
+        raise
     except Exception as e:
         conn.close()
         return jsonify({"error": "创建用户失败"}), 500
@@ -1192,10 +2129,15 @@ def reset_user_password(user_id):
             "UPDATE users SET password = ? WHERE id = ?",
             (hashed_password, user_id),
         )
+        auth_cache.bump(conn)
         conn.commit()
         conn.close()
 
         return jsonify({"message": f"用户 {user['username']} 的密码已重置"})
+    except PasswordHasherBusy:
+        # 交给 PasswordHasherBusy 的错误处理返回 503 和 Retry-After
+        conn.close()
+        raise
     except Exception as e:
         conn.close()
         return jsonify({"error": "重置密码失败"}), 500
@@ -1208,7 +2150,10 @@ def delete_user(user_id):
         return jsonify({"error": "不能删除自己的账户"}), 400
 
     conn = get_db_connection()
+    # 先删除该用户的待办事项，满足外键约束
+    conn.execute("DELETE FROM todos WHERE user_id = ?", (user_id,))
     cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    auth_cache.bump(conn)
     conn.commit()
     conn.close()
 
@@ -1221,33 +2166,31 @@ def delete_user(user_id):
 @app.route("/api/admin/users/<int:user_id>/todos", methods=["GET"])
 @admin_required
 def get_user_todos(user_id):
-    conn = get_db_connection()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    try:
+        limit, cursor = get_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 连接由流式响应持有到发送完毕，直接从连接池借出
+    conn = db_pool.acquire()
+    user = conn.execute("SELECT id FROM users WHERE id = ?", (user_id,)).fetchone()
 
     if not user:
         conn.close()
         return jsonify({"error": "用户不存在"}), 404
 
-    todos = conn.execute(
-        "SELECT * FROM todos WHERE user_id = ? ORDER BY created_at DESC",
-        (user_id,),
-    ).fetchall()
-    conn.close()
-
-    result = []
-    for todo in todos:
-        result.append(
-            {
-                "id": todo["id"],
-                "title": todo["title"],
-                "description": todo["description"],
-                "completed": bool(todo["completed"]),
-                "created_date": todo["created_date"],
-                "created_at": todo["created_at"],
-            }
-        )
+    etag = list_etag(
+        "admin-todos", user_id, get_todo_revision(conn, user_id), query_key()
+    )
+    response = not_modified(etag)
+    if response is not None:
+        conn.close()
+        return response
 
-    return jsonify(result)
+    response = stream_page(
+        conn, TODOS_BY_USER_QUERY, (user_id,), limit, cursor, encode_admin_todo
+    )
+    return cacheable(response, etag)
 
 
 @app.route("/api/admin/test-email", methods=["POST"])
@@ -1259,24 +2202,16 @@ def test_email():
     if not email or "@" not in email:
         return jsonify({"error": "请提供有效的邮箱地址"}), 400
 
-    html_content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; padding: 20px;">
-            <h2 style="color: #667eea;">✅ 邮件测试成功！</h2>
-            <p>这是一封测试邮件，用于验证邮件服务配置是否正确。</p>
-            <p>发送时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            <hr>
-            <p style="color: #666; font-size: 12px;">
-                此邮件由待办事项系统自动发送，请勿回复。
-            </p>
-        </body>
-    </html>
-    """
+    html_content = render_email(
+        "test_email.html", sent_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
 
-    success = send_email(email, "待办事项系统 - 邮件测试", html_content)
+    conn = get_db_connection()
+    success = queue_email(conn, email, "待办事项系统 - 邮件测试", html_content)
+    conn.close()
 
     if success:
-        return jsonify({"message": f"测试邮件已发送到 {email}"})
+        return jsonify({"message": f"测试邮件已加入发送队列: {email}"})
     else:
         return jsonify({"error": "邮件发送失败，请检查配置"}), 500
 
@@ -1288,81 +2223,47 @@ def send_reminder_now():
         return jsonify({"error": "邮件服务未启用"}), 400
 
     conn = get_db_connection()
-    user = conn.execute(
-        "SELECT * FROM users WHERE id = ?", (session["user_id"],)
-    ).fetchone()
+    user = select_one(conn, User, USER_BY_ID_QUERY, (session["user_id"],))
 
-    if not user or not user["email"]:
+    if not user or not user.email:
         conn.close()
         return jsonify({"error": "用户未设置邮箱"}), 400
 
     now = datetime.now()
     current_date = now.strftime("%Y-%m-%d")
 
-    todos = conn.execute(
-        "SELECT * FROM todos WHERE user_id = ? AND completed = 0 ORDER BY created_date DESC",
-        (user["id"],),
-    ).fetchall()
-
-    conn.close()
+    # 没有未完成待办时不会产出
+    _, todos, total = next(
+        iter_open_todos_by_user(conn, [user.id], Config.MAIL_MAX_TODO_ITEMS),
+        (user.id, [], 0),
+    )
 
     if not todos:
+        conn.close()
         return jsonify({"message": "没有未完成的待办事项"})
 
-    html_content = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #4A90D9 0%, #67B8DE 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .greeting {{ font-size: 24px; margin-bottom: 20px; }}
-            .todo-list {{ background: white; padding: 20px; border-radius: 8px; margin: 20px 0; }}
-            .todo-item {{ padding: 10px 0; border-bottom: 1px solid #eee; }}
-            .todo-item:last-child {{ border-bottom: none; }}
-            .footer {{ text-align: center; color: #999; margin-top: 30px; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📋 待办事项提醒</h1>
-            </div>
-            <div class="content">
-                <p class="greeting">你好，{user['username']}！</p>
-                <p>今天是 {current_date}，你还有 <strong>{len(todos)}</strong> 个待办事项未完成：</p>
-                <div class="todo-list">
-                    {"".join([f'<div class="todo-item">{todo["title"]}</div>' for todo in todos])}
-                </div>
-                <p style="margin-top: 20px;">点击 <a href="http://localhost:5145">这里</a> 查看和管理你的待办事项。</p>
-            </div>
-            <div class="footer">
-                <p>此邮件由系统自动发送，请勿回复。</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-    send_email(user["email"], f"待办事项提醒 - {current_date}", html_content)
-
-    return jsonify({"message": f"提醒邮件已发送到 {user['email']}"})
+    html_content = render_email(
+        "reminder_now.html",
+        username=user.username,
+        current_date=current_date,
+        todos=todos,
+        total=total,
+    )
 
+    # 复用请求级连接写入发件箱，不再从连接池借出第二个连接
+    queued = queue_email(conn, user.email, f"待办事项提醒 - {current_date}", html_content)
+    conn.close()
 
-if __name__ == "__main__":
-    init_db()
-    app.run(debug=True, host="0.0.0.0", port=5145)
+    if not queued:
+        return jsonify({"error": "邮件服务未配置"}), 500
+
+    return jsonify({"message": f"提醒邮件已加入发送队列: {user.email}"})
 
 
-# Gunicorn 启动钩子（在 Gunicorn 环境下启动定时任务）
-def on_starting(server):
-    """Gunicorn 启动时调用"""
-    logger.info("Gunicorn 正在启动...")
+if __name__ == "__main__":
     init_db()
+    email_outbox.start()
+    reset_tokens.start()
     start_reminder_scheduler()
+    app.run(debug=True, host="0.0.0.0", port=5145)
 
-
-def when_ready(server):
-    """Gunicorn 准备好接受请求时调用"""
-    logger.info("Gunicorn 已就绪")
@@ -0,0 +1,241 @@
+"""
+权限缓存与密码重置令牌
+每个工作进程缓存用户的身份和角色，管理接口鉴权时不再每次查询数据库；
+数据库中保存一个单调递增的用户版本号，创建、删除用户或重置密码时递增，
+各进程发现版本号变化后清空缓存，使权限撤销在所有进程中及时生效。
+密码重置令牌保存在数据库中，所有工作进程共享
+"""
+
+import hashlib
+import logging
+import secrets
+import threading
+import time
+
+from db import ForkSafe, ForkSafeWorker
+
+logger = logging.getLogger(__name__)
+
+AUTH_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS auth_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO auth_version (id, version) VALUES (1, 0)",
+]
+
+
+def create_auth_tables(conn):
+    """创建用户版本号表（幂等）"""
+    for statement in AUTH_STATEMENTS:
+        conn.execute(statement)
+
+
+class AuthCache(ForkSafe):
+    """
+    用户身份与角色缓存
+    :param pool: 数据库连接池
+    :param ttl: 缓存条目的有效秒数
+    :param version_check_interval: 检查用户版本号的最短间隔（秒），
+        其他进程中的权限变更最多这么久后在本进程生效
+    """
+
+    def __init__(self, pool, ttl=60, version_check_interval=1):
+        self.pool = pool
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        # 缓存不跨 fork 复用，子进程从空缓存开始
+        self._register_fork_reset()
+
+    def _reset(self):
+        """清空缓存（fork 后在子进程中调用）"""
+        self._lock = threading.Lock()
+        # user_id -> (用户信息, 过期时间)
+        self._users = {}
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def _check_version(self, conn):
+        """版本号变化时清空缓存（调用方持有连接）"""
+        row = conn.execute("SELECT version FROM auth_version WHERE id = 1").fetchone()
+        version = row[0] if row else 0
+        with self._lock:
+            if version != self._version:
+                self._users.clear()
+                self._version = version
+            self._version_checked_at = time.monotonic()
+
+    def get_user(self, user_id):
+        """
+        获取用户身份和角色
+        :return: {"id", "username", "is_admin"}，用户不存在时返回 None
+        """
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+
+        conn = self.pool.acquire()
+        try:
+            self._check_version(conn)
+            entry = self._users.get(user_id)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+
+            row = conn.execute(
+                "SELECT id, username, is_admin FROM users WHERE id = ?", (user_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        user = dict(row) if row else None
+        with self._lock:
+            self._users[user_id] = (user, now + self.ttl)
+        return user
+
+    def bump(self, conn):
+        """
+        递增用户版本号（不提交事务，与用户数据的修改在同一事务中提交）
+        本进程下次鉴权时会重新读取版本号
+        """
+        conn.execute("UPDATE auth_version SET version = version + 1 WHERE id = 1")
+        self._version_checked_at = 0.0
+
+
+RESET_TOKEN_STATEMENTS = [
+    # 只保存令牌的 SHA-256 摘要，数据库泄露时无法直接使用其中的令牌
+    """
+    CREATE TABLE IF NOT EXISTS reset_tokens (
+        token_hash TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    # 批量清理过期令牌
+    "CREATE INDEX IF NOT EXISTS idx_reset_tokens_expires ON reset_tokens (expires_at)",
+]
+
+
+def create_reset_token_table(conn):
+    """创建密码重置令牌表（幂等）"""
+    for statement in RESET_TOKEN_STATEMENTS:
+        conn.execute(statement)
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ResetTokenStore(ForkSafeWorker):
+    """
+    密码重置令牌存储
+    令牌保存在数据库中，任何工作进程都能按主键查询；过期令牌由后台线程分批删除
+    :param pool: 数据库连接池
+    :param ttl: 令牌有效期（秒）
+    :param sweep_interval: 清理过期令牌的间隔（秒）
+    :param sweep_batch_size: 每次删除的最大令牌数
+    """
+
+    thread_name = "reset-token-sweeper"
+
+    def __init__(self, pool, ttl=3600, sweep_interval=600, sweep_batch_size=1000):
+        self.pool = pool
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        # 清理线程不会随 fork 复制，子进程中重新启动
+        self._register_fork_reset()
+
+    def issue(self, conn, user_id):
+        """
+        生成令牌并保存其摘要（不提交事务，与发送重置邮件在同一事务中提交）
+        使用调用方持有的连接，请求中不必再从连接池借出第二个连接
+        :return: 令牌明文（只出现在重置链接中）
+        """
+        token = secrets.token_urlsafe(32)
+        conn.execute(
+            """
+            INSERT INTO reset_tokens (token_hash, user_id, expires_at)
+            VALUES (?, ?, ?)
+            """,
+            (_token_hash(token), user_id, time.time() + self.ttl),
+        )
+
+        self.start()
+        return token
+
+    def lookup(self, token):
+        """
+        查询令牌
+        :return: (用户ID, 是否已过期)，令牌不存在时返回 None
+        """
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute(
+                "SELECT user_id, expires_at FROM reset_tokens WHERE token_hash = ?",
+                (_token_hash(token),),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return row["user_id"], row["expires_at"] <= time.time()
+
+    def consume(self, conn, token):
+        """
+        使用令牌（不提交事务，与密码修改在同一事务中提交）
+        令牌被删除，同一令牌只能成功使用一次
+        :return: (用户ID, 是否已过期)，令牌不存在时返回 None
+        """
+        row = conn.execute(
+            """
+            DELETE FROM reset_tokens WHERE token_hash = ?
+            RETURNING user_id, expires_at
+            """,
+            (_token_hash(token),),
+        ).fetchone()
+        if row is None:
+            return None
+        return row["user_id"], row["expires_at"] <= time.time()
+
+    def revoke_user(self, conn, user_id):
+        """删除用户的全部令牌（不提交事务）"""
+        conn.execute("DELETE FROM reset_tokens WHERE user_id = ?", (user_id,))
+
+    def sweep(self):
+        """
+        分批删除过期令牌
+        :return: 删除的令牌数
+        """
+        deleted = 0
+        while True:
+            conn = self.pool.acquire()
+            try:
+                count = conn.execute(
+                    """
+                    DELETE FROM reset_tokens WHERE token_hash IN (
+                        SELECT token_hash FROM reset_tokens WHERE expires_at <= ? LIMIT ?
+                    )
+                    """,
+                    (time.time(), self.sweep_batch_size),
+                ).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            deleted += count
+            if count < self.sweep_batch_size:
+                return deleted
+
+    def _run(self):
+        while True:
+            try:
+                deleted = self.sweep()
+            except Exception as e:
+                logger.error(f"清理过期重置令牌失败: {e}")
+            else:
+                if deleted:
+                    logger.info(f"已清理 {deleted} 个过期的重置令牌")
+            time.sleep(self.sweep_interval)
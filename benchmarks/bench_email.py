@@ -0,0 +1,127 @@
+"""
+提醒邮件渲染基准测试
+对不同数量的未完成待办，比较原先逐条 f-string 拼接（每条待办 strptime 解析创建时间）
+与预编译 Jinja 模板（不限条数 / 按 MAIL_MAX_TODO_ITEMS 截断）渲染一封提醒邮件的耗时和邮件大小
+
+用法：
+    python benchmarks/bench_email.py --sizes 10,100,1000,10000 --ops 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from emails import render_email
+
+USERNAME = "alice"
+SLOT_LABEL = "2024-01-01 09:00"
+WINDOW_LABEL = "每天 09:00 起每 60 分钟，至 21:30"
+
+
+def make_todos(count, now):
+    return [
+        {
+            "title": f"待办事项 {i} - 整理季度报告并回复邮件",
+            "created_at": (now - timedelta(minutes=37 * i)).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_time_ago(created_at_str):
+    created_at = datetime.strptime(created_at_str, "%Y-%m-%d %H:%M:%S")
+    diff = datetime.now() - created_at
+    if diff.days > 0:
+        return f"{diff.days}天前"
+    if diff.seconds >= 3600:
+        return f"{diff.seconds // 3600}小时前"
+    if diff.seconds >= 60:
+        return f"{diff.seconds // 60}分钟前"
+    return "刚刚"
+
+
+def legacy_render(todos):
+    """原先的实现：循环中用 += 拼接每条待办的 HTML"""
+    todo_items_html = ""
+    for todo in todos:
+        created_at = todo["created_at"]
+        time_ago = legacy_time_ago(created_at)
+        todo_items_html += f"""
+        <div class="todo-item">
+            <div class="todo-title">{todo["title"]}</div>
+            <div class="todo-meta">
+                <span class="todo-date">创建于: {created_at}</span>
+                <span class="time-ago">已过去: {time_ago}</span>
+            </div>
+        </div>
+        """
+    return f"""
+    <html><body>
+        <p>你好，{USERNAME}！</p>
+        <p>{SLOT_LABEL} | {WINDOW_LABEL}</p>
+        <p>您共有 <strong>{len(todos)}</strong> 个待办事项未完成：</p>
+        <div class="todo-list">{todo_items_html}</div>
+    </body></html>
+    """
+
+
+def template_render(todos, limit=None):
+    return render_email(
+        "reminder.html",
+        username=USERNAME,
+        todos=todos[:limit] if limit else todos,
+        total=len(todos),
+        slot_label=SLOT_LABEL,
+        window_label=WINDOW_LABEL,
+        now=datetime.now(),
+    )
+
+
+def measure(render, ops):
+    samples = []
+    html = ""
+    for _ in range(ops):
+        start = time.perf_counter()
+        html = render()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e3, samples[-1] * 1e3, len(html.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提醒邮件渲染基准测试")
+    parser.add_argument(
+        "--sizes", default="10,100,1000,10000", help="未完成待办数量（逗号分隔）"
+    )
+    parser.add_argument("--ops", type=int, default=20, help="每项测试的渲染次数")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=Config.MAIL_MAX_TODO_ITEMS,
+        help="邮件中最多列出的待办数",
+    )
+    args = parser.parse_args()
+
+    now = datetime.now()
+    print(f"{'待办数':>8} {'实现':<20} {'p50 (ms)':>10} {'max (ms)':>10} {'大小 (KB)':>10}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        todos = make_todos(size, now)
+        cases = [
+            ("f-string 拼接", lambda: legacy_render(todos)),
+            ("Jinja 模板", lambda: template_render(todos)),
+            (f"Jinja 模板 (前 {args.limit} 条)", lambda: template_render(todos, args.limit)),
+        ]
+        for label, render in cases:
+            p50, worst, length = measure(render, args.ops)
+            print(f"{size:>8} {label:<20} {p50:>10.3f} {worst:>10.3f} {length / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
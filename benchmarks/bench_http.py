@@ -0,0 +1,505 @@
+"""
+HTTP 负载基准测试
+生成指定规模的合成数据库（默认 1 万个用户、100 万条待办），用 gunicorn（gunicorn.conf.py）启动真实应用，
+多个并发客户端进程各自登录后按权重随机执行典型操作：登录、待办列表的三种视图、添加 / 修改 / 删除待办、
+管理后台用户列表和用户搜索。统计每个接口的 p50/p95/p99 延迟、错误数和吞吐量，
+结果以 JSON 写入文件，可以用 --compare 对比两次运行（如修改前后的两个提交）
+
+用法：
+    python benchmarks/bench_http.py --users 10000 --todos 1000000 --clients 32 --duration 60 --output head.json
+    # 生成的数据库保存到 --db 指定的路径，之后的运行直接复用（每次运行使用它的副本，写操作不会累积）
+    python benchmarks/bench_http.py --db /tmp/bench_todos.db --output head.json
+    python benchmarks/bench_http.py --compare base.json head.json
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "bench-password"
+ADMIN_USERNAME = "bench_admin"
+
+WORDS = [
+    "买菜", "写周报", "开会", "健身", "读书笔记", "复习英语", "项目评审", "整理房间",
+    "缴纳电费", "预约医生", "代码审查", "准备演讲", "回复邮件", "部署上线", "季度总结",
+    "review", "deploy", "meeting", "invoice", "refactor", "backup", "report", "release",
+]
+
+# 操作及其权重
+OPERATIONS = [
+    ("login", 2),
+    ("todos_open", 25),
+    ("todos_all", 15),
+    ("todos_date", 10),
+    ("todo_add", 10),
+    ("todo_update", 10),
+    ("todo_delete", 5),
+    ("admin_users", 8),
+    ("admin_search", 8),
+]
+
+# 与 init_db 相同的表结构；先批量写入数据，索引、计数表和全文索引由 init_db 一次性建立
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        email TEXT,
+        is_admin INTEGER DEFAULT 0,
+        reminder_time INTEGER DEFAULT 540,
+        created_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime')),
+        last_login_at TIMESTAMP,
+        next_reminder_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS todos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        completed INTEGER DEFAULT 0,
+        created_date DATE,
+        created_at TIMESTAMP,
+        user_id INTEGER NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """,
+]
+
+
+def random_time(now, days):
+    return now - timedelta(seconds=random.randint(0, days * 86400))
+
+
+def seed(path, users, todos, days):
+    """
+    生成合成数据库：users 个普通用户（另加一个管理员）和 todos 条待办
+    调用前须把环境变量 DB_NAME 设为 path（应用配置在导入时读取）
+    """
+    # 与服务端相同的密码哈希参数，所有用户共用同一个哈希
+    from passwords import PasswordHasher
+    from config import Config
+
+    hasher = PasswordHasher(
+        Config.PASSWORD_HASH_N, Config.PASSWORD_HASH_R, Config.PASSWORD_HASH_P
+    )
+    password_hash = hasher.hash(PASSWORD)
+    now = datetime.now()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+    conn.execute(
+        "INSERT INTO users (username, password, email, is_admin, created_at) "
+        "VALUES (?, ?, ?, 1, ?)",
+        (ADMIN_USERNAME, password_hash, "admin@example.com", f"{now:%Y-%m-%d %H:%M:%S}"),
+    )
+    conn.executemany(
+        "INSERT INTO users (username, password, email, created_at) VALUES (?, ?, ?, ?)",
+        (
+            (
+                f"user{i}",
+                password_hash,
+                f"user{i}@example.com",
+                f"{random_time(now, days):%Y-%m-%d %H:%M:%S}",
+            )
+            for i in range(1, users + 1)
+        ),
+    )
+
+    def rows():
+        for _ in range(todos):
+            created = random_time(now, days)
+            yield (
+                " ".join(random.choices(WORDS, k=random.randint(1, 3))),
+                " ".join(random.choices(WORDS, k=random.randint(0, 6))),
+                random.random() < 0.5,
+                f"{created:%Y-%m-%d}",
+                f"{created:%Y-%m-%d %H:%M:%S}",
+                random.randint(2, users + 1),
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO todos (title, description, completed, created_date, created_at, user_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+
+    # 建立索引、计数表、全文索引等其余结构（DB_NAME 已指向 path）
+    from app import init_db
+
+    init_db()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, db_path, port, workers):
+    """以 gunicorn.conf.py 的配置启动应用，返回进程和日志文件路径"""
+    env = dict(os.environ, DB_NAME=db_path)
+    log_path = os.path.join(workdir, "gunicorn.log")
+    log = open(log_path, "w")
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "-c", "gunicorn.conf.py",
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "app:app",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    log.close()
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn 启动失败，见 {log_path}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/login")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return server, log_path
+        except OSError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"gunicorn 启动超时，见 {log_path}")
+
+
+class Client:
+    """单个客户端：一条长连接，保存会话 Cookie"""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+        self.cookie = None
+
+    def request(self, method, path, body=None):
+        """发送请求并读完响应，返回 (状态码, 响应体, 响应对象)"""
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, data, response
+            except (http.client.HTTPException, OSError):
+                # 服务端关闭了空闲的长连接，重新连接后重试一次
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def login(self, username):
+        status, _, response = self.request(
+            "POST", "/api/login", {"username": username, "password": PASSWORD}
+        )
+        cookie = response.getheader("Set-Cookie")
+        return status, cookie.split(";", 1)[0] if cookie else None
+
+
+def run_client(options):
+    """
+    客户端进程：持续执行随机操作直到结束时间
+    :return: {操作名: [(开始时间, 耗时秒数, 状态码), ...]}
+    """
+    rng = random.Random(options["seed"])
+    client = Client(options["port"])
+    admin = Client(options["port"])
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    users = options["users"]
+    today = datetime.now()
+    samples = {name: [] for name in names}
+    created = []
+
+    def user_name():
+        return f"user{rng.randint(1, users)}"
+
+    _, client.cookie = client.login(user_name())
+    _, admin.cookie = admin.login(ADMIN_USERNAME)
+
+    while time.time() < options["end"]:
+        name = rng.choices(names, weights)[0]
+        if name in ("todo_update", "todo_delete") and not created:
+            name = "todo_add"
+
+        start = time.time()
+        tick = time.perf_counter()
+        if name == "login":
+            status, cookie = client.login(user_name())
+            if cookie:
+                client.cookie = cookie
+                created.clear()
+        elif name == "todos_open":
+            status, _, _ = client.request("GET", "/api/todos")
+        elif name == "todos_all":
+            status, _, _ = client.request("GET", "/api/todos?view=all")
+        elif name == "todos_date":
+            day = today - timedelta(days=rng.randint(0, options["days"]))
+            status, _, _ = client.request("GET", f"/api/todos?date={day:%Y-%m-%d}")
+        elif name == "todo_add":
+            status, data, _ = client.request(
+                "POST",
+                "/api/todos",
+                {"title": " ".join(rng.choices(WORDS, k=2)), "description": "bench"},
+            )
+            if status == 201:
+                created.append(json.loads(data)["id"])
+        elif name == "todo_update":
+            status, _, _ = client.request(
+                "PUT", f"/api/todos/{rng.choice(created)}", {"completed": rng.random() < 0.5}
+            )
+        elif name == "todo_delete":
+            todo_id = created.pop(rng.randrange(len(created)))
+            status, _, _ = client.request("DELETE", f"/api/todos/{todo_id}")
+        elif name == "admin_users":
+            status, _, _ = admin.request("GET", "/api/admin/users")
+        else:
+            # 精确的用户名、用户名中的数字片段、匹配所有用户的邮箱域名
+            search = rng.choice(
+                [user_name(), str(rng.randint(1, users)), "example"]
+            )
+            status, _, _ = admin.request("GET", f"/api/admin/users?search={search}")
+        samples[name].append((start, time.perf_counter() - tick, status))
+
+    return samples
+
+
+def percentile(sorted_values, p):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, start, duration):
+    """按操作汇总测量窗口 [start, start + duration) 内的样本"""
+    endpoints = {}
+    all_latencies = []
+    total_errors = 0
+    for name, _ in OPERATIONS:
+        window = [
+            (latency, status)
+            for begin, latency, status in samples.get(name, [])
+            if start <= begin < start + duration
+        ]
+        latencies = sorted(latency * 1e3 for latency, _ in window)
+        errors = sum(1 for _, status in window if status >= 400)
+        total_errors += errors
+        all_latencies.extend(latencies)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": round(len(latencies) / duration, 2),
+            "p50_ms": round(percentile(latencies, 0.50) or 0, 3),
+            "p95_ms": round(percentile(latencies, 0.95) or 0, 3),
+            "p99_ms": round(percentile(latencies, 0.99) or 0, 3),
+            "max_ms": round(latencies[-1] if latencies else 0, 3),
+        }
+    all_latencies.sort()
+    endpoints["total"] = {
+        "requests": len(all_latencies),
+        "errors": total_errors,
+        "throughput": round(len(all_latencies) / duration, 2),
+        "p50_ms": round(percentile(all_latencies, 0.50) or 0, 3),
+        "p95_ms": round(percentile(all_latencies, 0.95) or 0, 3),
+        "p99_ms": round(percentile(all_latencies, 0.99) or 0, 3),
+        "max_ms": round(all_latencies[-1] if all_latencies else 0, 3),
+    }
+    return endpoints
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(endpoints):
+    print(
+        f"{'接口':<14} {'请求数':>8} {'错误':>6} {'req/s':>9} "
+        f"{'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}"
+    )
+    for name, stats in endpoints.items():
+        print(
+            f"{name:<14} {stats['requests']:>8} {stats['errors']:>6} "
+            f"{stats['throughput']:>9.1f} {stats['p50_ms']:>10.2f} "
+            f"{stats['p95_ms']:>10.2f} {stats['p99_ms']:>10.2f}"
+        )
+
+
+def compare(base_path, head_path):
+    """对比两次运行结果中各接口的吞吐量和延迟（变化百分比，延迟为负表示变快）"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"基准: {base.get('revision')}  对比: {head.get('revision')}")
+    print(f"{'接口':<14} {'req/s':>16} {'p50':>16} {'p99':>16}")
+
+    def change(old, new):
+        if not old:
+            return f"{new:>8.1f}"
+        return f"{new:>8.1f} {(new - old) / old * 100:+6.1f}%"
+
+    for name, stats in head["endpoints"].items():
+        old = base["endpoints"].get(name, {})
+        print(
+            f"{name:<14} {change(old.get('throughput'), stats['throughput']):>16} "
+            f"{change(old.get('p50_ms'), stats['p50_ms']):>16} "
+            f"{change(old.get('p99_ms'), stats['p99_ms']):>16}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP 负载基准测试")
+    parser.add_argument("--users", type=int, default=10000, help="普通用户数")
+    parser.add_argument("--todos", type=int, default=1000000, help="待办总数")
+    parser.add_argument("--days", type=int, default=90, help="待办创建时间分布的天数")
+    parser.add_argument("--db", help="合成数据库路径：存在时直接复用，否则生成后保存到这里")
+    parser.add_argument("--clients", type=int, default=32, help="并发客户端进程数")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn 工作进程数")
+    parser.add_argument("--duration", type=float, default=60, help="测量时长（秒）")
+    parser.add_argument("--warmup", type=float, default=10, help="预热时长（秒），不计入结果")
+    parser.add_argument("--seed", type=int, default=1, help="随机数种子")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASE", "HEAD"), help="对比两个结果文件"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="bench_http_")
+    server = None
+    try:
+        db_path = os.path.join(workdir, "todos.db")
+        # 生成数据和服务端都使用临时目录中的会话库，不发送邮件
+        os.environ["DB_NAME"] = args.db or db_path
+        os.environ["SESSION_DB_NAME"] = os.path.join(workdir, "sessions.db")
+        os.environ["MAIL_ENABLED"] = "False"
+        if args.db and os.path.exists(args.db):
+            print(f"复用数据库 {args.db}")
+        else:
+            start = time.perf_counter()
+            seed(args.db or db_path, args.users, args.todos, args.days)
+            print(
+                f"生成 {args.users} 个用户、{args.todos} 条待办: "
+                f"{time.perf_counter() - start:.1f} s"
+            )
+        if args.db:
+            shutil.copyfile(args.db, db_path)
+
+        # 复用的数据库可能以其他参数生成，以实际数据为准
+        conn = sqlite3.connect(db_path)
+        users, todos = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM users WHERE is_admin = 0), "
+            "(SELECT COUNT(*) FROM todos)"
+        ).fetchone()
+        conn.close()
+
+        port = free_port()
+        server, log_path = start_server(workdir, db_path, port, args.workers)
+        print(f"gunicorn 已启动（{args.workers} 个工作进程），日志: {log_path}")
+
+        measure_start = time.time() + args.warmup
+        end = measure_start + args.duration
+        options = [
+            {
+                "port": port,
+                "users": users,
+                "days": args.days,
+                "end": end,
+                "seed": args.seed * 1000 + i,
+            }
+            for i in range(args.clients)
+        ]
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(run_client, options)
+
+        samples = {}
+        for result in results:
+            for name, values in result.items():
+                samples.setdefault(name, []).extend(values)
+        endpoints = summarize(samples, measure_start, args.duration)
+
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                "users": users,
+                "todos": todos,
+                "clients": args.clients,
+                "workers": args.workers,
+                "duration": args.duration,
+                "warmup": args.warmup,
+                "seed": args.seed,
+            },
+            "endpoints": endpoints,
+        }
+        print_table(endpoints)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"结果已写入 {args.output}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
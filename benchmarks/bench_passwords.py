@@ -0,0 +1,91 @@
+"""
+密码哈希基准测试
+对不同的 scrypt 代价参数 n，模拟多个并发登录请求校验密码，
+输出每秒可完成的登录数、延迟分位数以及因排队已满被拒绝的请求数
+
+用法：
+    python benchmarks/bench_passwords.py --costs 4096,16384,32768 --clients 8 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+def bench(n, args):
+    hasher = PasswordHasher(
+        n=n,
+        r=args.r,
+        p=1,
+        max_workers=args.workers,
+        max_pending=args.queue,
+        timeout=args.timeout,
+    )
+    stored = hasher.hash("secret1")
+    latencies = []
+    rejected = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                hasher.verify("secret1", stored)
+            except PasswordHasherBusy:
+                with lock:
+                    rejected[0] += 1
+                # 被拒绝的客户端稍后重试
+                time.sleep(0.01)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    count = len(latencies)
+    p50 = latencies[count // 2] * 1000 if count else 0
+    p99 = latencies[int(count * 0.99)] * 1000 if count else 0
+    memory = 128 * args.r * n / 1024 / 1024
+    print(
+        f"n={n:<7} 内存 {memory:5.1f} MiB   登录 {count / elapsed:8.1f} 次/秒   "
+        f"p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   拒绝 {rejected[0]}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="密码哈希基准测试")
+    parser.add_argument(
+        "--costs", default="4096,8192,16384,32768", help="逗号分隔的 scrypt n 参数"
+    )
+    parser.add_argument("--r", type=int, default=8, help="scrypt 块大小")
+    parser.add_argument("--clients", type=int, default=8, help="并发登录请求数")
+    parser.add_argument("--workers", type=int, default=2, help="哈希线程数")
+    parser.add_argument("--queue", type=int, default=16, help="排队上限")
+    parser.add_argument("--timeout", type=float, default=10, help="等待超时（秒）")
+    parser.add_argument("--seconds", type=float, default=5, help="每个参数的测试时长")
+    args = parser.parse_args()
+
+    print(
+        f"并发 {args.clients}，哈希线程 {args.workers}，排队上限 {args.queue}，"
+        f"CPU 核数 {os.cpu_count()}"
+    )
+    for n in (int(cost) for cost in args.costs.split(",")):
+        bench(n, args)
+
+
+if __name__ == "__main__":
+    main()
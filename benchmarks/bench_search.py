@@ -0,0 +1,168 @@
+"""
+待办全文搜索基准测试
+生成指定数量的待办（中英文混合标题和描述，分布在多个用户中），
+建立 FTS5 trigram 索引后，按随机用户和随机关键词测量 search_todos 的延迟分布
+
+用法：
+    python benchmarks/bench_search.py --todos 1000000 --users 2000 --ops 2000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import create_indexes
+from search import create_todo_search, parse_terms, search_todos
+
+WORDS = [
+    "买菜", "写周报", "开会", "健身", "读书笔记", "复习英语", "项目评审", "整理房间",
+    "缴纳电费", "预约医生", "代码审查", "准备演讲", "回复邮件", "修复登录问题", "部署上线",
+    "季度总结", "家长会", "洗车", "订机票", "续签合同", "review", "deploy", "meeting",
+    "invoice", "refactor", "backup", "dentist", "groceries", "report", "release",
+]
+
+
+def random_text(count):
+    return " ".join(random.choices(WORDS, k=count))
+
+
+def seed(conn, todos, users):
+    conn.execute(
+        """
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT,
+            is_admin INTEGER DEFAULT 0,
+            reminder_time INTEGER DEFAULT 540,
+            created_at TIMESTAMP,
+            last_login_at TIMESTAMP,
+            next_reminder_at TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE todos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            completed INTEGER DEFAULT 0,
+            created_date DATE,
+            created_at TIMESTAMP,
+            user_id INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1
+        )
+        """
+    )
+    create_indexes(conn)
+
+    def rows():
+        for i in range(todos):
+            day = f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+            yield (
+                random_text(random.randint(1, 3)),
+                random_text(random.randint(0, 6)) or None,
+                random.random() < 0.5,
+                day,
+                f"{day} {i % 24:02d}:{i % 60:02d}:00",
+                random.randint(1, users),
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO todos (title, description, completed, created_date, created_at, user_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        rows(),
+    )
+    # 先写入数据再一次性建立全文索引，比逐行触发器更新更快
+    create_todo_search(conn)
+    conn.commit()
+
+
+def measure(label, conn, queries, users, limit):
+    samples = []
+    hits = 0
+    for text in queries:
+        user_id = random.randint(1, users)
+        start = time.perf_counter()
+        rows = search_todos(conn, user_id, parse_terms(text), limit)
+        samples.append(time.perf_counter() - start)
+        hits += len(rows)
+    samples.sort()
+
+    def pct(p):
+        return samples[min(int(len(samples) * p), len(samples) - 1)] * 1e3
+
+    print(
+        f"{label:<24} p50 {pct(0.5):7.2f} ms   p95 {pct(0.95):7.2f} ms   "
+        f"p99 {pct(0.99):7.2f} ms   平均命中 {hits / len(samples):.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="待办全文搜索基准测试")
+    parser.add_argument("--todos", type=int, default=1000000, help="待办总数")
+    parser.add_argument("--users", type=int, default=2000, help="用户数")
+    parser.add_argument("--ops", type=int, default=2000, help="每项测试的搜索次数")
+    parser.add_argument("--limit", type=int, default=50, help="每页结果数")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        conn = sqlite3.connect(os.path.join(workdir, "todos.db"))
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+        start = time.perf_counter()
+        seed(conn, args.todos, args.users)
+        elapsed = time.perf_counter() - start
+        print(f"写入 {args.todos} 条待办（{args.users} 个用户）并建立索引: {elapsed:.1f} s")
+
+        long_words = [w for w in WORDS if len(w) >= 3]
+        short_words = [w for w in WORDS if len(w) < 3]
+        measure(
+            "单个关键词 (>=3 字)",
+            conn,
+            random.choices(long_words, k=args.ops),
+            args.users,
+            args.limit,
+        )
+        measure(
+            "多个关键词",
+            conn,
+            [" ".join(random.sample(long_words, 2)) for _ in range(args.ops)],
+            args.users,
+            args.limit,
+        )
+        measure(
+            "子串 (3 字)",
+            conn,
+            [w[:3] for w in random.choices(long_words, k=args.ops)],
+            args.users,
+            args.limit,
+        )
+        measure(
+            "短关键词 (LIKE)",
+            conn,
+            random.choices(short_words, k=args.ops),
+            args.users,
+            args.limit,
+        )
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
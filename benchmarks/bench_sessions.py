@@ -0,0 +1,130 @@
+"""
+会话存储基准测试
+在同样数量的存活会话下，比较文件系统存储（Flask-Session filesystem）与 SQLite 存储
+（冷缓存 / 热缓存）单次读取和写入会话的耗时
+
+用法：
+    python benchmarks/bench_sessions.py --sessions 100000 --ops 20000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_session.filesystem import FileSystemSessionInterface
+
+from db import ConnectionPool
+from sessions import SQLiteSessionInterface, create_session_table
+
+LIFETIME = timedelta(days=31)
+
+
+def make_session(interface, sid):
+    session = interface.session_class(sid=sid, permanent=False)
+    session["user_id"] = random.randint(1, 100000)
+    session["username"] = f"user{sid[:8]}"
+    session["is_admin"] = False
+    return session
+
+
+def populate(interface, count):
+    sids = []
+    for _ in range(count):
+        sid = interface._generate_sid(32)
+        interface._upsert_session(
+            LIFETIME, make_session(interface, sid), interface._get_store_id(sid)
+        )
+        sids.append(sid)
+    return sids
+
+
+def measure(label, func, sids, ops):
+    """执行 ops 次 func(sid)，输出平均耗时和 p50/p99"""
+    samples = []
+    for sid in random.choices(sids, k=ops):
+        start = time.perf_counter()
+        func(sid)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    avg = sum(samples) / len(samples) * 1e6
+    p50 = samples[len(samples) // 2] * 1e6
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    print(f"{label:<28} avg {avg:8.1f} µs   p50 {p50:8.1f} µs   p99 {p99:8.1f} µs")
+
+
+def bench(name, interface, sids, ops, clear_cache=None):
+    def read(sid):
+        if clear_cache:
+            clear_cache()
+        interface._retrieve_session_data(interface._get_store_id(sid))
+
+    def write(sid):
+        interface._upsert_session(
+            LIFETIME, make_session(interface, sid), interface._get_store_id(sid)
+        )
+
+    measure(f"{name} read", read, sids, ops)
+    measure(f"{name} write", write, sids, ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话存储基准测试")
+    parser.add_argument("--sessions", type=int, default=100000, help="存活会话数")
+    parser.add_argument("--ops", type=int, default=20000, help="每项测试的操作次数")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)
+    app = Flask(__name__)
+    workdir = tempfile.mkdtemp(prefix="bench_sessions_")
+    try:
+        print(f"存活会话数: {args.sessions}，每项操作次数: {args.ops}")
+
+        # threshold=0 表示不限制文件数（默认 500 个文件后会删除会话）
+        fs = FileSystemSessionInterface(
+            app, cache_dir=os.path.join(workdir, "files"), threshold=0
+        )
+        start = time.perf_counter()
+        sids = populate(fs, args.sessions)
+        elapsed = time.perf_counter() - start
+        print(f"filesystem 写入 {args.sessions} 个会话: {elapsed:.1f} s")
+        bench("filesystem", fs, sids, args.ops)
+
+        pool = ConnectionPool(
+            os.path.join(workdir, "sessions.db"),
+            pragmas=[("journal_mode", "WAL"), ("synchronous", "NORMAL")],
+        )
+        conn = pool.acquire()
+        create_session_table(conn)
+        conn.commit()
+        conn.close()
+        sqlite = SQLiteSessionInterface(app, pool, cache_size=args.sessions)
+        start = time.perf_counter()
+        sids = populate(sqlite, args.sessions)
+        elapsed = time.perf_counter() - start
+        print(f"sqlite 写入 {args.sessions} 个会话: {elapsed:.1f} s")
+        bench(
+            "sqlite (cold cache)",
+            sqlite,
+            sids,
+            args.ops,
+            clear_cache=sqlite._cache.clear,
+        )
+        sqlite.cache_ttl = 3600
+        for sid in sids:
+            sqlite._retrieve_session_data(sqlite._get_store_id(sid))
+        bench("sqlite (warm cache)", sqlite, sids, args.ops)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -38,3 +38,113 @@ class Config:
     MAIL_ENABLED = os.environ.get("MAIL_ENABLED", "True").lower() in ["true", "1", "t"]
     # 提醒时间（小时）
     MAIL_REMINDER_HOUR = int(os.environ.get("MAIL_REMINDER_HOUR", 0))
+    # 每个用户从其设置的提醒时间起，每隔多少分钟提醒一次
+    REMINDER_INTERVAL_MINUTES = int(os.environ.get("REMINDER_INTERVAL_MINUTES", 60))
+    # 每日最后一次提醒的时间（一天中的分钟数，默认 21:30）
+    REMINDER_END_TIME = int(os.environ.get("REMINDER_END_TIME", 21 * 60 + 30))
+    # 每批处理的到期用户数
+    REMINDER_BATCH_SIZE = int(os.environ.get("REMINDER_BATCH_SIZE", 500))
+    # 定时任务最长休眠秒数（及时发现其他进程修改的提醒时间）
+    REMINDER_MAX_SLEEP = int(os.environ.get("REMINDER_MAX_SLEEP", 60))
+    # 提醒发送记录保留天数，更早的记录每天清理一次
+    REMINDER_LEDGER_RETENTION_DAYS = int(
+        os.environ.get("REMINDER_LEDGER_RETENTION_DAYS", 7)
+    )
+    # 提醒邮件中最多列出的待办数，其余只显示数量
+    MAIL_MAX_TODO_ITEMS = int(os.environ.get("MAIL_MAX_TODO_ITEMS", 50))
+    # 定时任务主节点租约有效期（秒），主节点失效后最多这么久由其他进程接管
+    SCHEDULER_LEASE_TTL = int(os.environ.get("SCHEDULER_LEASE_TTL", 30))
+    # 每个进程保持的 SMTP 会话数
+    MAIL_POOL_SIZE = int(os.environ.get("MAIL_POOL_SIZE", 2))
+    # 单个 SMTP 连接最多发送的邮件数，达到后重新连接
+    MAIL_MAX_MESSAGES_PER_CONNECTION = int(
+        os.environ.get("MAIL_MAX_MESSAGES_PER_CONNECTION", 100)
+    )
+    # SMTP 连接空闲超过该秒数后重新连接
+    MAIL_IDLE_TIMEOUT = int(os.environ.get("MAIL_IDLE_TIMEOUT", 60))
+    # SMTP 网络超时（秒）
+    MAIL_TIMEOUT = int(os.environ.get("MAIL_TIMEOUT", 30))
+
+    # ==================== 邮件发件箱配置 ====================
+    # 投递线程每次领取的邮件数
+    OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 20))
+    # 最大投递次数，超过后转入死信
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5))
+    # 重试退避基数（秒），每次失败后翻倍
+    OUTBOX_RETRY_BASE = int(os.environ.get("OUTBOX_RETRY_BASE", 30))
+    # 空闲时轮询发件箱的间隔（秒）
+    OUTBOX_POLL_INTERVAL = int(os.environ.get("OUTBOX_POLL_INTERVAL", 5))
+    # 领取超时（秒），投递线程每发送一封邮件前刷新领取时间，
+    # 单封邮件超过该时间仍未完成视为投递线程已崩溃，由其他进程重新投递；需远大于 MAIL_TIMEOUT
+    OUTBOX_CLAIM_TIMEOUT = int(
+        os.environ.get("OUTBOX_CLAIM_TIMEOUT", max(300, MAIL_TIMEOUT * 4))
+    )
+    # 已发送邮件的保留天数，更早的记录每天清理一次
+    OUTBOX_RETENTION_DAYS = int(os.environ.get("OUTBOX_RETENTION_DAYS", 7))
+
+    # ==================== Gunicorn 配置 ====================
+    # 工作进程数
+    GUNICORN_WORKERS = int(os.environ.get("GUNICORN_WORKERS", 4))
+    # 每个工作进程的线程数（gthread 模式），每个线程同一时刻最多持有一个数据库连接
+    GUNICORN_THREADS = int(os.environ.get("GUNICORN_THREADS", 32))
+
+    # ==================== 数据库配置 ====================
+    # SQLite 数据库文件路径
+    DB_NAME = os.environ.get("DB_NAME", "todos.db")
+    # 每个工作进程的连接池大小，默认等于线程数再加上使用连接的 5 个后台线程
+    # （发件箱投递、令牌清理、定时任务租约、提醒调度、变更推送），请求不会因等待连接而超时
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", GUNICORN_THREADS + 5))
+    # 每个连接的预编译语句缓存条数
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 256))
+    # 内存映射大小（字节）
+    DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", 256 * 1024 * 1024))
+    # 页缓存大小（负数表示 KiB）
+    DB_CACHE_SIZE = int(os.environ.get("DB_CACHE_SIZE", -16000))
+    # 数据库繁忙时的等待时间（毫秒）
+    DB_BUSY_TIMEOUT = int(os.environ.get("DB_BUSY_TIMEOUT", 5000))
+    # 待办删除记录（墓碑）保留天数，更早断开的客户端需要全量重新加载
+    TODO_CHANGES_RETENTION_DAYS = int(os.environ.get("TODO_CHANGES_RETENTION_DAYS", 7))
+
+    # ==================== 实时推送配置 ====================
+    # 轮询待办变更的间隔（秒），即推送到其他标签页和设备的最大延迟
+    STREAM_POLL_INTERVAL = float(os.environ.get("STREAM_POLL_INTERVAL", 0.5))
+    # 心跳间隔（秒），及时发现已断开的连接并避免代理超时
+    STREAM_HEARTBEAT_INTERVAL = int(os.environ.get("STREAM_HEARTBEAT_INTERVAL", 15))
+    # 单个连接的最长保持时间（秒），到期后由浏览器自动重连并重新鉴权
+    STREAM_MAX_DURATION = int(os.environ.get("STREAM_MAX_DURATION", 300))
+    # 每个工作进程最多保持的推送连接数，需小于 Gunicorn 的 threads，为普通请求保留线程
+    STREAM_MAX_CONNECTIONS = int(os.environ.get("STREAM_MAX_CONNECTIONS", 24))
+
+    # ==================== 会话配置 ====================
+    # 会话存储后端：sqlite（默认）或 filesystem（Flask-Session 文件存储）
+    SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")
+    # 会话数据库文件路径（与会话目录放在一起，Docker 中使用同一个数据卷）
+    SESSION_DB_NAME = os.environ.get("SESSION_DB_NAME", "flask_session/sessions.db")
+    # 每个工作进程缓存的会话数
+    SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", 10000))
+    # 会话缓存有效期（秒），其他进程中的登出最多延迟这么久生效
+    SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", 5))
+    # 清理过期会话的间隔（秒）
+    SESSION_GC_INTERVAL = int(os.environ.get("SESSION_GC_INTERVAL", 300))
+
+    # ==================== 权限配置 ====================
+    # 权限缓存有效期（秒）
+    AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 60))
+    # 检查用户版本号的间隔（秒），其他进程中的权限变更最多这么久后生效
+    AUTH_VERSION_CHECK_INTERVAL = float(
+        os.environ.get("AUTH_VERSION_CHECK_INTERVAL", 1)
+    )
+    # 密码哈希 scrypt 代价参数：n 为 2 的幂，每次哈希约占用 128 * r * n 字节内存
+    PASSWORD_HASH_N = int(os.environ.get("PASSWORD_HASH_N", 2**14))
+    PASSWORD_HASH_R = int(os.environ.get("PASSWORD_HASH_R", 8))
+    PASSWORD_HASH_P = int(os.environ.get("PASSWORD_HASH_P", 1))
+    # 每个工作进程同时计算密码哈希的线程数
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    # 每个工作进程排队的密码哈希任务上限，超出时返回 503
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 16))
+    # 等待密码哈希结果的最长秒数
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+    # 密码重置链接有效期（秒）
+    RESET_TOKEN_TTL = int(os.environ.get("RESET_TOKEN_TTL", 3600))
+    # 清理过期重置令牌的间隔（秒）
+    RESET_TOKEN_SWEEP_INTERVAL = int(os.environ.get("RESET_TOKEN_SWEEP_INTERVAL", 600))
@@ -0,0 +1,695 @@
+"""
+数据库连接层
+为每个工作进程维护一个有界的 SQLite 连接池：
+连接创建时一次性设置 PRAGMA，并启用预编译语句缓存；
+gunicorn fork 出工作进程后自动丢弃从主进程继承的连接。
+ForkSafe / ForkSafeWorker 供其他模块的进程内状态和后台线程复用同样的 fork 处理
+"""
+
+import os
+import sqlite3
+import threading
+from collections import deque
+
+from repository import (
+    TODO_COLUMNS,
+    TODOS_BY_DATE_QUERY,
+    TODOS_BY_USER_QUERY,
+    TODOS_OPEN_QUERY,
+    USER_BY_EMAIL_QUERY,
+    USER_SUMMARY_QUERY,
+    column_list,
+)
+
+
+class PoolExhaustedError(sqlite3.OperationalError):
+    """连接池已耗尽（等待超时仍没有可用连接）"""
+
+
+class ForkSafe:
+    """
+    fork 安全的进程内状态
+    锁、缓存、连接等状态在 _reset 中创建；gunicorn fork 出工作进程后在子进程中自动调用 _reset 重建。
+    子类在 __init__ 中调用 _register_fork_reset
+    """
+
+    def _register_fork_reset(self):
+        """初始化进程内状态，并注册为在 fork 出的子进程中重建"""
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """创建进程内状态（fork 后在子进程中调用）"""
+        raise NotImplementedError
+
+
+class ForkSafeWorker(ForkSafe):
+    """
+    带后台线程的 fork 安全对象
+    线程不会随 fork 复制，start 在每个进程中只启动一个线程执行 _run；
+    子类设置 thread_name 并实现 _run，重写 _reset 时需调用父类的实现
+    """
+
+    thread_name = None
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+    def start(self):
+        """
+        在当前进程启动后台线程（每个进程只启动一个）
+        :return: 本次调用是否启动了线程
+        """
+        pid = os.getpid()
+        if self._worker_pid == pid:
+            return False
+        with self._lock:
+            if self._worker_pid == pid:
+                return False
+            self._worker_pid = pid
+
+        thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        thread.start()
+        return True
+
+    def _run(self):
+        """后台线程的主循环"""
+        raise NotImplementedError
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    连接池中的连接
+    close() 不会真正关闭连接，而是回滚未提交的事务并归还到连接池
+    """
+
+    pool = None
+    pid = None
+    checked_out = False
+    request_scoped = False
+
+    def close(self):
+        if self.request_scoped:
+            # 请求级连接在请求结束时统一归还，这里只结束未提交的事务
+            if self.in_transaction:
+                self.rollback()
+            return
+
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+class ConnectionPool(ForkSafe):
+    """
+    有界 SQLite 连接池
+    :param database: 数据库文件路径
+    :param max_size: 同时借出的最大连接数
+    :param timeout: 等待可用连接的最长秒数
+    :param statement_cache_size: 每个连接的预编译语句缓存条数
+    :param pragmas: 新建连接时执行的 (名称, 值) PRAGMA 列表
+    """
+
+    def __init__(
+        self, database, max_size=8, timeout=10.0, statement_cache_size=256, pragmas=()
+    ):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.statement_cache_size = statement_cache_size
+        self.pragmas = list(pragmas)
+        # SQLite 连接不能跨 fork 使用，子进程中重建连接池
+        self._register_fork_reset()
+
+    def _reset(self):
+        """丢弃当前进程不可用的连接，重建连接池状态"""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def _connect(self):
+        """新建一个连接并设置 PRAGMA"""
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            factory=PooledConnection,
+            cached_statements=self.statement_cache_size,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.pool = self
+        conn.pid = self._pid
+        return conn
+
+    def acquire(self):
+        """
+        从连接池借出一个连接
+        没有空闲连接时新建，已达上限时等待，超时抛出 PoolExhaustedError
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolExhaustedError("数据库连接池已耗尽")
+
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        if conn.pid != self._pid or not conn.checked_out:
+            # 从父进程继承的连接或重复归还，直接忽略
+            return
+
+        conn.checked_out = False
+        conn.request_scoped = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            sqlite3.Connection.close(conn)
+        else:
+            with self._lock:
+                self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            while self._idle:
+                sqlite3.Connection.close(self._idle.pop())
+
+
+# 热点查询使用的二级索引（rowid 隐式位于索引末尾，可直接满足 ORDER BY created_at, id）
+INDEX_STATEMENTS = [
+    # 今日未完成视图、提醒扫描：WHERE user_id = ? AND completed = ? ORDER BY created_at
+    "CREATE INDEX IF NOT EXISTS idx_todos_user_completed_created "
+    "ON todos (user_id, completed, created_at)",
+    # 按日期查看：WHERE user_id = ? AND created_date = ? ORDER BY created_at
+    "CREATE INDEX IF NOT EXISTS idx_todos_user_date_created "
+    "ON todos (user_id, created_date, created_at)",
+    # 全部视图、管理后台用户待办：WHERE user_id = ? ORDER BY created_at
+    "CREATE INDEX IF NOT EXISTS idx_todos_user_created "
+    "ON todos (user_id, created_at)",
+    # 管理后台用户列表：ORDER BY created_at
+    "CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)",
+]
+
+# 键集分页的排序与游标条件
+_PAGE = " AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?"
+_PAGE_PARAMS = ("2024-01-01 00:00:00", 1, 51)
+
+# 提醒调度：取出到期的用户
+DUE_REMINDERS_QUERY = """
+    SELECT id, username, email, reminder_time, next_reminder_at
+    FROM users
+    WHERE next_reminder_at <= ?
+    ORDER BY next_reminder_at
+    LIMIT ?
+"""
+
+# 提醒发送记录：取出待发送的提醒时段（含上次中断的运行留下的）
+PENDING_REMINDERS_QUERY = """
+    SELECT user_id, slot FROM reminder_ledger
+    WHERE slot >= ? AND status = 'pending'
+    ORDER BY slot
+    LIMIT ?
+"""
+
+# 提醒发送记录：把一批待发送的时段原子地改为 sending 并返回，同一时段只会被一个进程领取
+CLAIM_REMINDERS_QUERY = f"""
+    UPDATE reminder_ledger SET status = 'sending', claimed_by = ?, claimed_at = ?
+    WHERE (user_id, slot) IN ({PENDING_REMINDERS_QUERY})
+    RETURNING user_id, slot
+"""
+
+
+def reminder_users_query(user_count):
+    """
+    取出一批用户的提醒收件信息
+    :param user_count: IN 列表中的用户数
+    """
+    placeholders = ", ".join("?" * user_count)
+    return f"""
+        SELECT id, username, email, reminder_time FROM users
+        WHERE id IN ({placeholders})
+    """
+
+
+def open_todos_query(user_count):
+    """
+    一次有序查询取出一批用户的未完成待办，按用户聚集
+    :param user_count: IN 列表中的用户数
+    """
+    placeholders = ", ".join("?" * user_count)
+    return f"""
+        SELECT user_id, title, created_at
+        FROM todos
+        WHERE completed = 0 AND user_id IN ({placeholders})
+        ORDER BY user_id DESC, created_at DESC, id DESC
+    """
+
+
+# 热点查询及期望命中的索引，用于 EXPLAIN QUERY PLAN 检查
+HOT_QUERIES = [
+    (TODOS_OPEN_QUERY + _PAGE, (1, *_PAGE_PARAMS), "idx_todos_user_completed_created"),
+    (
+        TODOS_BY_DATE_QUERY + _PAGE,
+        ("2024-01-01", 1, *_PAGE_PARAMS),
+        "idx_todos_user_date_created",
+    ),
+    (TODOS_BY_USER_QUERY + _PAGE, (1, *_PAGE_PARAMS), "idx_todos_user_created"),
+    (USER_SUMMARY_QUERY + " WHERE 1=1" + _PAGE, _PAGE_PARAMS, "idx_users_created"),
+    (USER_BY_EMAIL_QUERY, ("a@example.com",), "idx_users_email"),
+    (
+        DUE_REMINDERS_QUERY,
+        ("2024-01-01 00:00:00", 500),
+        "idx_users_next_reminder",
+    ),
+    (open_todos_query(3), (1, 2, 3), "idx_todos_user_completed_created"),
+    (
+        PENDING_REMINDERS_QUERY,
+        ("2024-01-01 00:00:00", 500),
+        "idx_reminder_ledger_slot_status",
+    ),
+]
+
+
+def create_indexes(conn):
+    """
+    创建热点查询索引（幂等）
+    :return: users.email 唯一索引创建成功返回 True；存在重复邮箱时退化为普通索引并返回 False
+    """
+    for statement in INDEX_STATEMENTS:
+        conn.execute(statement)
+
+    try:
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email)"
+        )
+    except sqlite3.IntegrityError:
+        # 历史数据中存在重复邮箱，先用普通索引保证查询不走全表扫描
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_email_dup ON users (email)")
+        return False
+
+    conn.execute("DROP INDEX IF EXISTS idx_users_email_dup")
+    return True
+
+
+def check_query_plans(conn, queries=None):
+    """
+    使用 EXPLAIN QUERY PLAN 检查热点查询
+    :return: 不符合预期的 (sql, 查询计划) 列表，出现全表扫描、临时排序或未命中期望索引都视为不符合
+    """
+    problems = []
+    for sql, params, index_name in queries or HOT_QUERIES:
+        details = [
+            row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        ]
+        plan = " | ".join(details)
+        full_scan = any(
+            detail.startswith("SCAN") and "INDEX" not in detail for detail in details
+        )
+        if (
+            full_scan
+            or "TEMP B-TREE" in plan
+            or (index_name and index_name not in plan)
+        ):
+            problems.append((sql, plan))
+    return problems
+
+
+# 每个用户的待办计数（未完成数 = total - completed），由触发器增量维护
+TODO_STATS_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS todo_stats (
+        user_id INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_stats_insert AFTER INSERT ON todos
+    BEGIN
+        INSERT INTO todo_stats (user_id, total, completed)
+        VALUES (NEW.user_id, 1, IFNULL(NEW.completed, 0) != 0)
+        ON CONFLICT (user_id) DO UPDATE SET
+            total = total + 1,
+            completed = completed + excluded.completed;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_stats_delete AFTER DELETE ON todos
+    BEGIN
+        UPDATE todo_stats SET
+            total = total - 1,
+            completed = completed - (IFNULL(OLD.completed, 0) != 0)
+        WHERE user_id = OLD.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_stats_update
+    AFTER UPDATE OF completed, user_id ON todos
+    BEGIN
+        UPDATE todo_stats SET
+            total = total - 1,
+            completed = completed - (IFNULL(OLD.completed, 0) != 0)
+        WHERE user_id = OLD.user_id;
+        INSERT INTO todo_stats (user_id, total, completed)
+        VALUES (NEW.user_id, 1, IFNULL(NEW.completed, 0) != 0)
+        ON CONFLICT (user_id) DO UPDATE SET
+            total = total + 1,
+            completed = completed + excluded.completed;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM todo_stats WHERE user_id = OLD.id;
+    END
+    """,
+]
+
+
+def create_todo_stats(conn):
+    """
+    创建待办计数表和维护触发器（幂等）
+    首次创建时根据现有待办事项回填计数
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todo_stats'"
+    ).fetchone()
+    for statement in TODO_STATS_STATEMENTS:
+        conn.execute(statement)
+    if not exists:
+        rebuild_todo_stats(conn)
+
+
+def rebuild_todo_stats(conn):
+    """
+    根据 todos 表重新计算所有用户的待办计数
+    :return: 重建的用户数
+    """
+    conn.execute("DELETE FROM todo_stats")
+    cursor = conn.execute(
+        """
+        INSERT INTO todo_stats (user_id, total, completed)
+        SELECT user_id, COUNT(*), SUM(IFNULL(completed, 0) != 0)
+        FROM todos GROUP BY user_id
+        """
+    )
+    return cursor.rowcount
+
+
+def verify_todo_stats(conn):
+    """
+    校验待办计数与 todos 表是否一致
+    :return: 不一致的 (user_id, 实际 (total, completed), 计数表 (total, completed)) 列表
+    """
+    expected = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute(
+            """
+            SELECT user_id, COUNT(*), SUM(IFNULL(completed, 0) != 0)
+            FROM todos GROUP BY user_id
+            """
+        )
+    }
+    recorded = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute("SELECT user_id, total, completed FROM todo_stats")
+    }
+
+    drift = []
+    for user_id in sorted(expected.keys() | recorded.keys()):
+        actual = expected.get(user_id, (0, 0))
+        stored = recorded.get(user_id, (0, 0))
+        if actual != stored:
+            drift.append((user_id, actual, stored))
+    return drift
+
+
+def create_reminder_schedule(conn):
+    """
+    为用户表补充 next_reminder_at 字段（下一次提醒时间）及其索引（幂等）
+    未设置邮箱或尚未排期的用户为 NULL，不会进入索引扫描范围
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+    if "next_reminder_at" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN next_reminder_at TIMESTAMP")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_next_reminder "
+        "ON users (next_reminder_at) WHERE next_reminder_at IS NOT NULL"
+    )
+
+
+REMINDER_LEDGER_STATEMENTS = [
+    # 每个用户的每个提醒时段只有一条记录，(user_id, slot) 唯一
+    """
+    CREATE TABLE IF NOT EXISTS reminder_ledger (
+        user_id INTEGER NOT NULL,
+        slot TIMESTAMP NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        created_at TIMESTAMP NOT NULL,
+        sent_at TIMESTAMP,
+        claimed_by TEXT,
+        claimed_at REAL,
+        PRIMARY KEY (user_id, slot)
+    )
+    """,
+    # 扫描待处理时段、按时段清理旧记录
+    "CREATE INDEX IF NOT EXISTS idx_reminder_ledger_slot_status "
+    "ON reminder_ledger (slot, status)",
+]
+
+
+def create_reminder_ledger(conn):
+    """创建提醒发送记录表（幂等），为已有的表补充领取字段"""
+    for statement in REMINDER_LEDGER_STATEMENTS:
+        conn.execute(statement)
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(reminder_ledger)")]
+    if "claimed_by" not in columns:
+        conn.execute("ALTER TABLE reminder_ledger ADD COLUMN claimed_by TEXT")
+    if "claimed_at" not in columns:
+        conn.execute("ALTER TABLE reminder_ledger ADD COLUMN claimed_at REAL")
+
+
+def compact_reminder_ledger(conn, before):
+    """
+    删除 before 之前的提醒发送记录（不提交事务）
+    :param before: 时间字符串，格式与 slot 相同
+    :return: 删除的记录数
+    """
+    return conn.execute(
+        "DELETE FROM reminder_ledger WHERE slot < ?", (before,)
+    ).rowcount
+
+
+def create_todo_versions(conn):
+    """
+    为待办表补充 version 字段（幂等）
+    每次修改待办时递增，用于 If-Match 乐观并发控制
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(todos)")]
+    if "version" not in columns:
+        conn.execute("ALTER TABLE todos ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+TODO_REVISION_STATEMENTS = [
+    # 每个用户的待办修改计数，任何待办写入都会递增，用于生成列表接口的 ETag
+    """
+    CREATE TABLE IF NOT EXISTS todo_revisions (
+        user_id INTEGER PRIMARY KEY,
+        revision INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_revision_insert AFTER INSERT ON todos
+    BEGIN
+        INSERT INTO todo_revisions (user_id, revision) VALUES (NEW.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_revision_delete AFTER DELETE ON todos
+    BEGIN
+        INSERT INTO todo_revisions (user_id, revision) VALUES (OLD.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_revision_update AFTER UPDATE ON todos
+    BEGIN
+        INSERT INTO todo_revisions (user_id, revision) VALUES (OLD.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1;
+        INSERT INTO todo_revisions (user_id, revision)
+        SELECT NEW.user_id, 1 WHERE NEW.user_id != OLD.user_id
+        ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_revision_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM todo_revisions WHERE user_id = OLD.id;
+    END
+    """,
+]
+
+
+def create_todo_revisions(conn):
+    """创建待办修改计数表和维护触发器（幂等）"""
+    for statement in TODO_REVISION_STATEMENTS:
+        conn.execute(statement)
+
+
+def get_todo_revision(conn, user_id):
+    """
+    读取用户的待办修改计数
+    :return: 计数，没有写入过待办的用户为 0
+    """
+    row = conn.execute(
+        "SELECT revision FROM todo_revisions WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+TODO_CHANGE_STATEMENTS = [
+    # 只追加的待办变更日志，seq 单调递增；客户端据此增量同步
+    """
+    CREATE TABLE IF NOT EXISTS todo_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        todo_id INTEGER NOT NULL,
+        changed_at REAL NOT NULL DEFAULT (strftime('%s', 'now'))
+    )
+    """,
+    # 按用户读取增量
+    "CREATE INDEX IF NOT EXISTS idx_todo_changes_user_seq "
+    "ON todo_changes (user_id, seq)",
+    # 压缩时查找同一待办的最新变更
+    "CREATE INDEX IF NOT EXISTS idx_todo_changes_todo_seq "
+    "ON todo_changes (todo_id, seq)",
+    # 压缩删除的墓碑中最大的 seq，早于它的游标无法再增量同步
+    """
+    CREATE TABLE IF NOT EXISTS todo_changes_horizon (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        seq INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO todo_changes_horizon (id, seq) VALUES (1, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_changes_insert AFTER INSERT ON todos
+    BEGIN
+        INSERT INTO todo_changes (user_id, todo_id) VALUES (NEW.user_id, NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_changes_update AFTER UPDATE ON todos
+    BEGIN
+        INSERT INTO todo_changes (user_id, todo_id) VALUES (NEW.user_id, NEW.id);
+        INSERT INTO todo_changes (user_id, todo_id)
+        SELECT OLD.user_id, OLD.id WHERE OLD.user_id != NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_changes_delete AFTER DELETE ON todos
+    BEGIN
+        INSERT INTO todo_changes (user_id, todo_id) VALUES (OLD.user_id, OLD.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_changes_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM todo_changes WHERE user_id = OLD.id;
+    END
+    """,
+]
+
+# 增量同步：每个待办只取 since 之后的最新一次变更，关联当前状态（不存在即为删除）
+TODO_CHANGES_QUERY = f"""
+    SELECT changes.seq, changes.todo_id, {column_list(TODO_COLUMNS, "todos")}
+    FROM (
+        SELECT todo_id, MAX(seq) AS seq
+        FROM todo_changes
+        WHERE user_id = ? AND seq > ? AND seq <= ?
+        GROUP BY todo_id
+        ORDER BY seq
+        LIMIT ?
+    ) AS changes
+    LEFT JOIN todos ON todos.id = changes.todo_id AND todos.user_id = ?
+    ORDER BY changes.seq
+"""
+
+
+def create_todo_changes(conn):
+    """创建待办变更日志和维护触发器（幂等）"""
+    for statement in TODO_CHANGE_STATEMENTS:
+        conn.execute(statement)
+
+
+def get_change_seq(conn):
+    """
+    当前最大的变更序号
+    取自 sqlite_sequence，压缩删除日志后也不会回退
+    """
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'todo_changes'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def get_change_horizon(conn):
+    """已被压缩的最大序号，早于它的游标需要全量重新加载"""
+    row = conn.execute("SELECT seq FROM todo_changes_horizon WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def compact_todo_changes(conn, before):
+    """
+    压缩待办变更日志（不提交事务）
+    1. 删除被同一待办后续变更覆盖的记录，增量结果不受影响
+    2. 删除 before（Unix 时间戳）之前的墓碑，并推进同步下限
+    :return: 删除的记录数
+    """
+    deleted = conn.execute(
+        """
+        DELETE FROM todo_changes
+        WHERE seq < (
+            SELECT MAX(later.seq) FROM todo_changes AS later
+            WHERE later.todo_id = todo_changes.todo_id
+        )
+        """
+    ).rowcount
+
+    tombstones = conn.execute(
+        """
+        DELETE FROM todo_changes
+        WHERE changed_at < ?
+          AND NOT EXISTS (SELECT 1 FROM todos WHERE todos.id = todo_changes.todo_id)
+        RETURNING seq
+        """,
+        (before,),
+    ).fetchall()
+    if tombstones:
+        conn.execute(
+            "UPDATE todo_changes_horizon SET seq = MAX(seq, ?) WHERE id = 1",
+            (max(row[0] for row in tombstones),),
+        )
+    return deleted + len(tombstones)
@@ -0,0 +1,67 @@
+"""
+邮件内容渲染
+邮件模板位于 templates/email/，由独立的 Jinja 环境在导入时一次性加载并编译，
+之后每次渲染只执行编译好的模板代码，不再读取和解析模板文件；变量自动做 HTML 转义。
+渲染不依赖 Flask 应用上下文，可以在定时任务和后台线程中调用
+"""
+
+import os
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader
+
+TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "templates", "email"
+)
+TEMPLATE_NAMES = (
+    "reminder.html",
+    "reminder_now.html",
+    "password_reset.html",
+    "test_email.html",
+)
+
+
+def format_time_ago(created_at, now=None):
+    """
+    格式化时间差，显示已过去多久
+    :param created_at: 创建时间（YYYY-MM-DD HH:MM:SS）
+    :param now: 当前时间，渲染一封邮件时由调用方传入同一个值，不必每条待办都重新取
+    """
+    try:
+        diff = (now or datetime.now()) - datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return "未知"
+
+    days = diff.days
+    hours = diff.seconds // 3600
+    minutes = (diff.seconds % 3600) // 60
+
+    if days > 0:
+        return f"{days}天前"
+    elif hours > 0:
+        return f"{hours}小时前"
+    elif minutes > 0:
+        return f"{minutes}分钟前"
+    else:
+        return "刚刚"
+
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=True,
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+_env.filters["time_ago"] = format_time_ago
+
+_templates = {name: _env.get_template(name) for name in TEMPLATE_NAMES}
+
+
+def render_email(name, **context):
+    """
+    渲染邮件模板
+    :param name: 模板文件名（templates/email/ 下）
+    :return: HTML 文本
+    """
+    return _templates[name].render(**context)
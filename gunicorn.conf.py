@@ -20,9 +20,15 @@ logger = logging.getLogger(__name__)
 # 添加应用目录到路径
 sys.path.insert(0, '/app')
 
+from config import Config
+
 # 服务器配置
 bind = "0.0.0.0:5145"
-workers = 4
+workers = Config.GUNICORN_WORKERS
+# 线程工作模式：SSE 推送连接只占用一个线程，不会独占工作进程
+# 连接池大小 DB_POOL_SIZE 默认由线程数推算，调整线程数时连接池随之变化
+worker_class = "gthread"
+threads = Config.GUNICORN_THREADS
 timeout = 120
 
 # 日志配置
@@ -44,14 +50,14 @@ def on_starting(server):
 def when_ready(server):
     """
     Gunicorn 准备好接受请求时调用
-    在工作进程启动后执行
+    在主进程中初始化数据库，之后再启动工作进程
     """
     logger.info("=" * 50)
-    logger.info("Gunicorn 已就绪，正在启动定时任务...")
+    logger.info("Gunicorn 已就绪，正在初始化数据库...")
     logger.info("=" * 50)
     
     # 导入应用模块
-    from app import init_db, start_reminder_scheduler
+    from app import init_db
     
     # 初始化数据库
     try:
@@ -59,11 +65,20 @@ def when_ready(server):
         logger.info("✓ 数据库初始化完成")
     except Exception as e:
         logger.error(f"✗ 数据库初始化失败: {e}")
-    
-    # 启动定时任务
+
+
+def post_worker_init(worker):
+    """
+    工作进程初始化完成后调用
+    启动邮件发件箱投递线程（继续投递重启前未发送的邮件）和过期重置令牌清理线程，
+    并参与定时任务主节点竞争：所有工作进程中只有租约持有者执行提醒
+    """
+    from app import email_outbox, reset_tokens, start_reminder_scheduler
+
+    email_outbox.start()
+    reset_tokens.start()
     try:
         start_reminder_scheduler()
-        logger.info("✓ 定时任务启动完成")
     except Exception as e:
         logger.error(f"✗ 定时任务启动失败: {e}")
 
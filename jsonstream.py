@@ -0,0 +1,92 @@
+"""
+流式 JSON 输出
+列表接口逐批读取查询游标，把每一行直接编码为 JSON 文本并由生成器分段写出，
+不再构造行对象的字典列表和完整的响应体，内存占用与列表长度无关。
+输出格式与 jsonify 一致（紧凑分隔符、非 ASCII 字符转义）
+"""
+
+import json
+from json.encoder import encode_basestring_ascii
+
+# 每次从游标读取的行数
+CHUNK_SIZE = 100
+
+
+def encode_value(value):
+    """编码单个标量值"""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return json.dumps(value)
+
+
+def row_encoder(record, fields):
+    """
+    生成行编码函数
+    :param record: 查询结果的记录类型（namedtuple），字段名在这里一次性换算为下标
+    :param fields: [(JSON 键, 字段名, 转换函数或 None)]
+    :return: 接收记录、返回 JSON 对象文本的函数
+    """
+    prefixes = [
+        ("{" if index == 0 else ",") + encode_basestring_ascii(key) + ":"
+        for index, (key, _, _) in enumerate(fields)
+    ]
+    columns = [
+        (prefix, record._fields.index(column), convert)
+        for prefix, (_, column, convert) in zip(prefixes, fields)
+    ]
+
+    def encode(row):
+        parts = []
+        for prefix, index, convert in columns:
+            value = row[index]
+            if convert is not None and value is not None:
+                value = convert(value)
+            parts.append(prefix)
+            parts.append(encode_value(value))
+        parts.append("}")
+        return "".join(parts)
+
+    return encode
+
+
+def iter_page(cursor, encode_row, limit, make_next_cursor, key="todos", head=None):
+    """
+    以 JSON 对象的形式分段输出一页查询结果：
+    {<head 中的字段>, "<key>": [...], "next_cursor": ...}
+    :param cursor: 已执行的查询游标，最多返回 limit + 1 行（多出的一行表示还有下一页）
+    :param make_next_cursor: 根据本页最后一行生成下一页游标
+    :param head: 列表之前输出的其他字段（字典）
+    """
+    prefix = "{"
+    for name, value in (head or {}).items():
+        prefix += encode_basestring_ascii(name) + ":" + encode_value(value) + ","
+    yield prefix + encode_basestring_ascii(key) + ":["
+
+    count = 0
+    last = None
+    has_more = False
+    while not has_more:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        parts = []
+        for row in rows:
+            if count == limit:
+                has_more = True
+                break
+            parts.append(encode_row(row))
+            last = row
+            count += 1
+        if parts:
+            yield ("," if count > len(parts) else "") + ",".join(parts)
+
+    next_cursor = make_next_cursor(last) if has_more else None
+    yield '],"next_cursor":' + encode_value(next_cursor) + "}"
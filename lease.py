@@ -0,0 +1,114 @@
+"""
+基于 SQLite 租约的主节点选举
+多个进程（包括不同主机上共享同一数据库的进程）竞争同一租约，
+持有者通过心跳续约，租约过期后由其他进程接管，保证同一时间只有一个主节点
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+
+from db import ForkSafeWorker
+
+logger = logging.getLogger(__name__)
+
+LEASE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+]
+
+
+def create_lease_table(conn):
+    """创建租约表（幂等）"""
+    for statement in LEASE_STATEMENTS:
+        conn.execute(statement)
+
+
+class LeaderLease(ForkSafeWorker):
+    """
+    命名租约
+    :param pool: 数据库连接池
+    :param name: 租约名称，竞争同一名称的进程中只有一个能成为主节点
+    :param ttl: 租约有效期（秒），心跳每 ttl / 3 秒续约一次
+    """
+
+    def __init__(self, pool, name, ttl=30):
+        self.pool = pool
+        self.name = name
+        self.ttl = ttl
+        self.thread_name = f"lease-{name}"
+        # 子进程需要使用新的持有者标识重新竞争
+        self._register_fork_reset()
+
+    def _reset(self):
+        """生成新的持有者标识并放弃主节点身份（fork 后在子进程中调用）"""
+        super()._reset()
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._expires_at = 0.0
+
+    @property
+    def is_leader(self):
+        """当前进程是否持有未过期的租约"""
+        return time.time() < self._expires_at
+
+    def try_acquire(self):
+        """
+        获取或续约租约
+        租约空闲、已过期或本来就由自己持有时成功
+        :return: 是否为主节点
+        """
+        now = time.time()
+        expires_at = now + self.ttl
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.execute(
+                """
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    holder = excluded.holder,
+                    expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+                """,
+                (self.name, self.holder, expires_at, now),
+            )
+            conn.commit()
+            acquired = cursor.rowcount == 1
+        finally:
+            conn.close()
+
+        was_leader = self.is_leader
+        # 本地有效期略短于数据库中的有效期，避免时钟误差导致两个主节点重叠
+        self._expires_at = now + self.ttl * 0.9 if acquired else 0.0
+        if acquired and not was_leader:
+            logger.info(f"成为主节点: {self.name} ({self.holder})")
+        elif was_leader and not acquired:
+            logger.warning(f"失去主节点身份: {self.name} ({self.holder})")
+        return acquired
+
+    def release(self):
+        """主动释放租约，其他进程可以立即接管"""
+        conn = self.pool.acquire()
+        try:
+            conn.execute(
+                "DELETE FROM leases WHERE name = ? AND holder = ?",
+                (self.name, self.holder),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self._expires_at = 0.0
+
+    def _run(self):
+        while True:
+            try:
+                self.try_acquire()
+            except Exception as e:
+                logger.error(f"租约续约失败: {self.name} ({e})")
+            time.sleep(self.ttl / 3)
@@ -0,0 +1,175 @@
+"""
+邮件发送层
+维护可复用的已登录 SMTP 会话：一次握手（TCP + STARTTLS + AUTH）发送多封邮件，
+断线自动重连，单个连接发送数量达到上限后主动重建
+"""
+
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from db import ForkSafe
+
+# 服务器主动关闭连接时返回的状态码（421 服务不可用）
+_RECONNECT_CODES = {421}
+
+
+class SMTPSession:
+    """
+    一个已登录的 SMTP 会话
+    由 SMTPPool 创建，发送前按需建立连接
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.server = None
+        self.sent = 0
+        self.last_used = 0.0
+        self.pid = os.getpid()
+
+    def connect(self):
+        """建立连接并登录"""
+        pool = self.pool
+        server = smtplib.SMTP(pool.host, pool.port, timeout=pool.timeout)
+        try:
+            if pool.use_tls:
+                server.starttls()
+            if pool.username:
+                server.login(pool.username, pool.password)
+        except Exception:
+            server.close()
+            raise
+
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """关闭连接（忽略关闭过程中的错误）"""
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def is_stale(self):
+        """连接空闲过久或发送数量达到上限时需要重建"""
+        if self.server is None:
+            return False
+        idle = time.monotonic() - self.last_used
+        return (
+            idle > self.pool.idle_timeout
+            or self.sent >= self.pool.max_messages_per_connection
+        )
+
+    def send(self, msg):
+        """
+        发送一封邮件
+        连接被服务器断开时重连并重试一次，其他错误直接抛出
+        """
+        for attempt in range(2):
+            if self.is_stale():
+                self.close()
+            if self.server is None:
+                self.connect()
+
+            try:
+                self.server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt:
+                    raise
+                continue
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code not in _RECONNECT_CODES:
+                    raise
+                self.close()
+                if attempt:
+                    raise
+                continue
+
+            self.sent += 1
+            self.last_used = time.monotonic()
+            return
+
+
+class SMTPPool(ForkSafe):
+    """
+    SMTP 会话池
+    :param max_size: 同时使用的最大会话数
+    :param max_messages_per_connection: 单个连接最多发送的邮件数，达到后重建连接
+    :param idle_timeout: 空闲超过该秒数的连接在下次使用前重建（服务器通常会断开空闲连接）
+    :param timeout: 网络操作超时秒数
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        username="",
+        password="",
+        use_tls=True,
+        max_size=2,
+        max_messages_per_connection=100,
+        idle_timeout=60,
+        timeout=30,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_size = max_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        # SMTP 连接不能跨 fork 共享，子进程中重建会话池
+        self._register_fork_reset()
+
+    def _reset(self):
+        """丢弃所有会话，重建会话池状态"""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    @contextmanager
+    def session(self):
+        """
+        借出一个会话，用于连续发送多封邮件
+        发送出错的会话会被关闭，不再放回会话池
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+        self._slots.acquire()
+        with self._lock:
+            smtp = self._idle.pop() if self._idle else SMTPSession(self)
+
+        try:
+            yield smtp
+        except Exception:
+            smtp.close()
+            raise
+        else:
+            if smtp.pid == self._pid:
+                with self._lock:
+                    self._idle.append(smtp)
+        finally:
+            self._slots.release()
+
+    def send(self, msg):
+        """借用一个会话发送单封邮件"""
+        with self.session() as smtp:
+            smtp.send(msg)
+
+    def close_all(self):
+        """关闭所有空闲会话"""
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
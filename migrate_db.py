@@ -1,8 +1,26 @@
 import sqlite3
-import hashlib
 import sys
 
-DB_NAME = "todos.db"
+from config import Config
+from outbox import create_outbox_table
+from passwords import PasswordHasher
+from lease import create_lease_table
+from auth import create_auth_tables, create_reset_token_table
+from search import create_todo_search, create_user_search
+from db import (
+    check_query_plans,
+    create_indexes,
+    create_reminder_ledger,
+    create_reminder_schedule,
+    create_todo_changes,
+    create_todo_revisions,
+    create_todo_stats,
+    create_todo_versions,
+    rebuild_todo_stats,
+    verify_todo_stats,
+)
+
+DB_NAME = Config.DB_NAME
 
 
 def get_db_connection():
@@ -12,7 +30,9 @@ def get_db_connection():
 
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return PasswordHasher(
+        n=Config.PASSWORD_HASH_N, r=Config.PASSWORD_HASH_R, p=Config.PASSWORD_HASH_P
+    ).hash(password)
 
 
 def migrate_database():
@@ -48,6 +68,48 @@ def migrate_database():
             cursor.execute("ALTER TABLE todos ADD COLUMN created_date DATE")
             print("✓ 添加 created_date 字段")
 
+        if "version" not in todo_columns:
+            create_todo_versions(conn)
+            print("✓ 添加 todos.version 字段")
+
+        if create_indexes(conn):
+            print("✓ 创建查询索引")
+        else:
+            print("✓ 创建查询索引（存在重复邮箱，email 唯一索引未创建）")
+
+        create_todo_stats(conn)
+        print("✓ 创建待办计数表")
+
+        create_todo_revisions(conn)
+        print("✓ 创建待办修改计数表")
+
+        create_todo_changes(conn)
+        print("✓ 创建待办变更日志")
+
+        create_todo_search(conn)
+        print("✓ 创建待办全文索引")
+
+        create_user_search(conn)
+        print("✓ 创建用户搜索索引")
+
+        create_outbox_table(conn)
+        print("✓ 创建邮件发件箱")
+
+        create_reminder_schedule(conn)
+        print("✓ 添加 next_reminder_at 字段（应用启动时为已有用户排期）")
+
+        create_reminder_ledger(conn)
+        print("✓ 创建提醒发送记录表")
+
+        create_lease_table(conn)
+        print("✓ 创建租约表")
+
+        create_auth_tables(conn)
+        print("✓ 创建用户版本号表")
+
+        create_reset_token_table(conn)
+        print("✓ 创建密码重置令牌表")
+
         conn.commit()
         print("✓ 数据库迁移完成")
 
@@ -79,5 +141,57 @@ def migrate_database():
         conn.close()
 
 
+def check_indexes():
+    """
+    检查热点查询的执行计划
+    出现全表扫描或临时排序时返回非零退出码
+    """
+    conn = get_db_connection()
+    try:
+        problems = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    if not problems:
+        print("✓ 热点查询均已命中索引")
+        return 0
+
+    for sql, plan in problems:
+        print(f"✗ {sql}")
+        print(f"  查询计划: {plan}")
+    return 1
+
+
+def check_todo_stats(rebuild=False):
+    """
+    校验待办计数，rebuild 为 True 时修复偏差
+    存在未修复的偏差时返回非零退出码
+    """
+    conn = get_db_connection()
+    try:
+        drift = verify_todo_stats(conn)
+        for user_id, actual, stored in drift:
+            print(f"✗ 用户 {user_id}: 实际 {actual}，计数表 {stored}")
+
+        if not drift:
+            print("✓ 待办计数与数据一致")
+            return 0
+        if not rebuild:
+            return 1
+
+        count = rebuild_todo_stats(conn)
+        conn.commit()
+        print(f"✓ 已重建 {count} 个用户的待办计数")
+        return 0
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
     migrate_database()
+    status = 0
+    if "--check" in sys.argv:
+        status |= check_indexes()
+    if "--verify-stats" in sys.argv or "--rebuild-stats" in sys.argv:
+        status |= check_todo_stats(rebuild="--rebuild-stats" in sys.argv)
+    sys.exit(status)
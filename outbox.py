@@ -0,0 +1,295 @@
+"""
+邮件发件箱
+请求中只把邮件写入 SQLite 的 email_outbox 表（不阻塞工作进程），
+由后台投递线程批量领取并发送；失败按指数退避重试，超过次数后转入死信
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from db import ForkSafeWorker
+
+logger = logging.getLogger(__name__)
+
+# 邮件状态
+STATUS_PENDING = "pending"  # 等待投递（含等待重试）
+STATUS_SENDING = "sending"  # 已被投递线程领取
+STATUS_SENT = "sent"  # 已发送
+STATUS_DEAD = "dead"  # 超过重试次数，不再投递
+
+OUTBOX_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        to_email TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        html_content TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        claimed_by TEXT,
+        claimed_at REAL,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        sent_at REAL,
+        latency_ms INTEGER
+    )
+    """,
+    # 领取待投递邮件、回收超时领取
+    "CREATE INDEX IF NOT EXISTS idx_outbox_status_next "
+    "ON email_outbox (status, next_attempt_at)",
+]
+
+
+def create_outbox_table(conn):
+    """创建发件箱表（幂等）"""
+    for statement in OUTBOX_STATEMENTS:
+        conn.execute(statement)
+
+
+def compact_outbox(conn, before):
+    """
+    删除 before 之前已发送的邮件（不提交事务）
+    死信保留在表中，便于排查投递失败的原因
+    :param before: 时间戳（秒）
+    :return: 删除的记录数
+    """
+    return conn.execute(
+        "DELETE FROM email_outbox WHERE status = ? AND sent_at < ?",
+        (STATUS_SENT, before),
+    ).rowcount
+
+
+class EmailOutbox(ForkSafeWorker):
+    """
+    发件箱及其后台投递线程
+    :param pool: 数据库连接池
+    :param deliver: 投递函数 deliver(to_email, subject, html_content, smtp)，失败时抛出异常
+    :param session_factory: 返回 SMTP 会话上下文管理器的函数，一批邮件共用一个会话
+    :param batch_size: 每次领取的邮件数
+    :param max_attempts: 最大投递次数，超过后转入死信
+    :param retry_base: 重试退避基数（秒），第 n 次失败后等待 retry_base * 2^(n-1)
+    :param retry_max: 单次退避的上限（秒）
+    :param poll_interval: 空闲时的轮询间隔（秒）
+    :param claim_timeout: 领取后超过该秒数仍未完成的邮件视为投递线程已崩溃，重新投递；
+        每封邮件发送前刷新领取时间，因此只需大于单封邮件的发送耗时
+    """
+
+    thread_name = "email-outbox"
+
+    def __init__(
+        self,
+        pool,
+        deliver,
+        session_factory,
+        batch_size=20,
+        max_attempts=5,
+        retry_base=30,
+        retry_max=3600,
+        poll_interval=5,
+        claim_timeout=300,
+    ):
+        self.pool = pool
+        self.deliver = deliver
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        # 线程不会随 fork 复制，子进程中重建状态，下次使用时重新启动投递线程
+        self._register_fork_reset()
+
+    def _reset(self):
+        """重建线程状态（fork 后在子进程中调用）"""
+        super()._reset()
+        self._wake = threading.Event()
+
+    def enqueue(self, conn, to_email, subject, html_content):
+        """
+        把邮件写入发件箱并唤醒投递线程
+        使用调用方持有的连接写入并提交（调用方尚未提交的修改一并提交），
+        请求中不必再从连接池借出第二个连接
+        :return: 发件箱记录 ID
+        """
+        now = time.time()
+        cursor = conn.execute(
+            """
+            INSERT INTO email_outbox
+                (to_email, subject, html_content, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (to_email, subject, html_content, now, now),
+        )
+        conn.commit()
+        outbox_id = cursor.lastrowid
+
+        self.start()
+        self._wake.set()
+        return outbox_id
+
+    def start(self):
+        """在当前进程启动投递线程（每个进程只启动一个）"""
+        started = super().start()
+        if started:
+            logger.info("邮件发件箱投递线程已启动")
+        return started
+
+    def _run(self):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        while True:
+            try:
+                delivered = self.process_batch(worker_id)
+            except Exception as e:
+                logger.error(f"发件箱投递失败: {e}")
+                delivered = 0
+
+            if not delivered:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def claim_batch(self, worker_id):
+        """
+        领取一批到期的待投递邮件
+        同时回收领取超时（投递线程崩溃）的邮件
+        """
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            conn.execute(
+                """
+                UPDATE email_outbox SET status = ?, claimed_by = NULL
+                WHERE status = ? AND claimed_at < ?
+                """,
+                (STATUS_PENDING, STATUS_SENDING, now - self.claim_timeout),
+            )
+            rows = conn.execute(
+                """
+                UPDATE email_outbox SET status = ?, claimed_by = ?, claimed_at = ?
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE status = ? AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT ?
+                )
+                RETURNING id, to_email, subject, html_content, attempts, created_at
+                """,
+                (
+                    STATUS_SENDING,
+                    worker_id,
+                    now,
+                    STATUS_PENDING,
+                    now,
+                    self.batch_size,
+                ),
+            ).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def process_batch(self, worker_id):
+        """
+        领取并投递一批邮件，一批邮件共用一个 SMTP 会话
+        :return: 本批领取的邮件数
+        """
+        rows = self.claim_batch(worker_id)
+        if not rows:
+            return 0
+
+        with self.session_factory() as smtp:
+            for row in rows:
+                # 一批邮件依次发送，领取时间按每封邮件刷新，排在后面的邮件不会因整批耗时过长被回收；
+                # 已被其他进程回收的邮件不再发送
+                if not self._renew_claim(row, worker_id):
+                    continue
+                try:
+                    self.deliver(
+                        row["to_email"], row["subject"], row["html_content"], smtp
+                    )
+                except Exception as e:
+                    self._mark_failed(row, worker_id, e)
+                else:
+                    self._mark_sent(row, worker_id)
+        return len(rows)
+
+    def _renew_claim(self, row, worker_id):
+        """
+        刷新领取时间
+        :return: 邮件仍由 worker_id 领取时返回 True
+        """
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.execute(
+                """
+                UPDATE email_outbox SET claimed_at = ?
+                WHERE id = ? AND status = ? AND claimed_by = ?
+                """,
+                (time.time(), row["id"], STATUS_SENDING, worker_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        if cursor.rowcount == 0:
+            logger.warning(f"邮件已被重新领取，跳过: {row['to_email']}")
+            return False
+        return True
+
+    def _mark_sent(self, row, worker_id):
+        now = time.time()
+        latency_ms = int((now - row["created_at"]) * 1000)
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.execute(
+                """
+                UPDATE email_outbox
+                SET status = ?, attempts = attempts + 1, sent_at = ?, latency_ms = ?,
+                    last_error = NULL
+                WHERE id = ? AND claimed_by = ?
+                """,
+                (STATUS_SENT, now, latency_ms, row["id"], worker_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        if cursor.rowcount == 0:
+            logger.warning(f"邮件已发送，但在发送期间被重新领取: {row['to_email']}")
+            return
+        logger.info(f"邮件已发送至: {row['to_email']} (排队到送达 {latency_ms} ms)")
+
+    def _mark_failed(self, row, worker_id, error):
+        attempts = row["attempts"] + 1
+        if attempts >= self.max_attempts:
+            status = STATUS_DEAD
+            next_attempt_at = time.time()
+            logger.error(
+                f"邮件发送失败 {attempts} 次，转入死信: {row['to_email']} ({error})"
+            )
+        else:
+            status = STATUS_PENDING
+            delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+            next_attempt_at = time.time() + delay
+            logger.warning(
+                f"邮件发送失败，{delay} 秒后重试: {row['to_email']} ({error})"
+            )
+
+        conn = self.pool.acquire()
+        try:
+            conn.execute(
+                """
+                UPDATE email_outbox
+                SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?,
+                    claimed_by = NULL
+                WHERE id = ? AND claimed_by = ?
+                """,
+                (status, attempts, next_attempt_at, str(error), row["id"], worker_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
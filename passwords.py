@@ -0,0 +1,148 @@
+"""
+密码哈希
+使用内存困难的 scrypt 算法，哈希值中记录格式版本和代价参数，调整参数后旧哈希仍可验证；
+兼容旧版无盐 SHA-256 哈希，登录成功时由调用方升级为当前格式。
+哈希计算在有界线程池中执行，排队数超过上限时直接拒绝，避免登录请求占满工作进程
+"""
+
+import base64
+import hashlib
+import hmac
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from db import ForkSafe
+
+# 当前哈希格式：scrypt$1$n$r$p$盐$哈希（盐和哈希为 base64）
+SCHEME = "scrypt"
+FORMAT_VERSION = 1
+
+# 旧版格式：无盐 SHA-256 十六进制摘要
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PasswordHasherBusy(RuntimeError):
+    """哈希线程池排队已满或等待超时"""
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class PasswordHasher(ForkSafe):
+    """
+    scrypt 密码哈希
+    :param n: CPU / 内存代价（2 的幂），占用内存约 128 * r * n 字节
+    :param r: 块大小
+    :param p: 并行度
+    :param max_workers: 每个进程同时计算哈希的线程数
+    :param max_pending: 每个进程最多排队（含正在计算）的哈希任务数，超出时抛出 PasswordHasherBusy
+    :param timeout: 等待哈希结果的最长秒数
+    """
+
+    def __init__(
+        self, n=2**14, r=8, p=1, max_workers=2, max_pending=16, timeout=10.0
+    ):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # 线程池不会随 fork 复制，子进程中重建
+        self._register_fork_reset()
+
+    def _reset(self):
+        """重建线程池（fork 后在子进程中调用）"""
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="password-hash"
+        )
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+
+    def _run(self, func, *args):
+        """在线程池中执行 func 并等待结果"""
+        pending = self._pending
+        if not pending.acquire(blocking=False):
+            raise PasswordHasherBusy("密码哈希任务过多")
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            pending.release()
+            raise
+        # 任务结束（而不是等待超时）时才释放名额，超时的任务仍计入排队数
+        future.add_done_callback(lambda _: pending.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy("密码哈希等待超时")
+
+    @staticmethod
+    def _scrypt(password, salt, n, r, p):
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            maxmem=128 * r * (n + p + 2) + 1024 * 1024,
+            dklen=32,
+        )
+
+    def hash(self, password):
+        """使用当前参数生成哈希"""
+        salt = secrets.token_bytes(16)
+        digest = self._run(self._scrypt, password, salt, self.n, self.r, self.p)
+        return "$".join(
+            [
+                SCHEME,
+                str(FORMAT_VERSION),
+                str(self.n),
+                str(self.r),
+                str(self.p),
+                _b64encode(salt),
+                _b64encode(digest),
+            ]
+        )
+
+    def verify(self, password, stored):
+        """
+        校验密码，支持当前格式和旧版 SHA-256 格式
+        :return: 是否匹配（哈希格式无法识别时返回 False）
+        """
+        if not stored:
+            return False
+
+        if _LEGACY_SHA256.match(stored):
+            digest = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(digest, stored)
+
+        parts = stored.split("$")
+        if len(parts) != 7 or parts[0] != SCHEME or parts[1] != str(FORMAT_VERSION):
+            return False
+        try:
+            n, r, p = int(parts[2]), int(parts[3]), int(parts[4])
+            salt, expected = _b64decode(parts[5]), _b64decode(parts[6])
+        except ValueError:
+            return False
+
+        digest = self._run(self._scrypt, password, salt, n, r, p)
+        return hmac.compare_digest(digest, expected)
+
+    def needs_rehash(self, stored):
+        """哈希是否为旧格式或使用了与当前配置不同的参数"""
+        parts = (stored or "").split("$")
+        return parts[:5] != [
+            SCHEME,
+            str(FORMAT_VERSION),
+            str(self.n),
+            str(self.r),
+            str(self.p),
+        ]
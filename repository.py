@@ -0,0 +1,137 @@
+"""
+数据访问层
+待办和用户的查询集中定义在这里，每条查询都列出所需的列（列表和详情查询不读取密码哈希），
+便于统一做查询计划检查（db.HOT_QUERIES）和建立索引。
+查询结果由游标的 row_factory 直接构造为只读的紧凑记录（namedtuple，不带实例字典），
+API 中的 JSON 对象统一由记录的 to_dict 生成
+"""
+
+from collections import namedtuple
+
+TODO_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "completed",
+    "created_date",
+    "created_at",
+    "version",
+)
+USER_COLUMNS = ("id", "username", "email", "is_admin", "created_at", "last_login_at")
+USER_SUMMARY_COLUMNS = USER_COLUMNS + ("todo_count", "completed_count")
+CREDENTIAL_COLUMNS = ("id", "username", "email", "is_admin", "password")
+
+
+def column_list(columns, table=None):
+    """生成 SELECT 列表，table 不为空时给每列加上表名前缀"""
+    if table:
+        return ", ".join(f"{table}.{column}" for column in columns)
+    return ", ".join(columns)
+
+
+class Todo(namedtuple("Todo", TODO_COLUMNS)):
+    """待办事项"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """API 返回的待办对象，version 用于 If-Match"""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "completed": bool(self.completed),
+            "created_date": self.created_date,
+            "created_at": self.created_at,
+            "version": self.version,
+        }
+
+
+class User(namedtuple("User", USER_COLUMNS)):
+    """用户（不含密码哈希和提醒设置）"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "email": self.email,
+            "is_admin": bool(self.is_admin),
+            "created_at": self.created_at,
+            "last_login_at": self.last_login_at,
+        }
+
+
+class UserSummary(namedtuple("UserSummary", USER_SUMMARY_COLUMNS)):
+    """管理后台用户列表中的一行，附带待办计数"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        result = User._make(self[: len(USER_COLUMNS)]).to_dict()
+        result["todo_count"] = self.todo_count
+        result["open_count"] = self.todo_count - self.completed_count
+        result["completed_count"] = self.completed_count
+        return result
+
+
+class Credentials(namedtuple("Credentials", CREDENTIAL_COLUMNS)):
+    """登录校验所需的用户信息，只有登录查询读取密码哈希"""
+
+    __slots__ = ()
+
+
+def _record_factory(record):
+    make = record._make
+    return lambda cursor, row: make(row)
+
+
+_FACTORIES = {
+    record: _record_factory(record)
+    for record in (Todo, User, UserSummary, Credentials)
+}
+
+
+def select(conn, record, query, params=()):
+    """
+    执行查询，返回逐行产出 record 记录的游标
+    查询的列必须与 record 的字段一一对应（按顺序）
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = _FACTORIES[record]
+    return cursor.execute(query, params)
+
+
+def select_one(conn, record, query, params=()):
+    """执行查询并返回第一条记录，没有结果时返回 None"""
+    return select(conn, record, query, params).fetchone()
+
+
+# 待办查询（键集分页的排序和 LIMIT 由调用方追加）
+TODO_SELECT = f"SELECT {column_list(TODO_COLUMNS)} FROM todos"
+TODOS_BY_USER_QUERY = TODO_SELECT + " WHERE user_id = ?"
+TODOS_OPEN_QUERY = TODO_SELECT + " WHERE user_id = ? AND completed = 0"
+TODOS_BY_DATE_QUERY = TODO_SELECT + " WHERE created_date = ? AND user_id = ?"
+# 追加到 UPDATE 语句后，返回更新后的待办
+TODO_RETURNING = f" RETURNING {column_list(TODO_COLUMNS)}"
+
+
+def todos_by_ids_query(count):
+    """按 ID 批量读取待办（不限定用户，调用方须确保 ID 属于当前用户）"""
+    placeholders = ", ".join("?" * count)
+    return f"{TODO_SELECT} WHERE id IN ({placeholders})"
+
+
+# 用户查询
+USER_BY_ID_QUERY = f"SELECT {column_list(USER_COLUMNS)} FROM users WHERE id = ?"
+USER_BY_EMAIL_QUERY = f"SELECT {column_list(USER_COLUMNS)} FROM users WHERE email = ?"
+CREDENTIALS_BY_USERNAME_QUERY = (
+    f"SELECT {column_list(CREDENTIAL_COLUMNS)} FROM users WHERE username = ?"
+)
+# 管理后台用户列表，待办数量来自触发器维护的 todo_stats（WHERE 子句由调用方追加）
+USER_SUMMARY_QUERY = f"""
+    SELECT {column_list(USER_COLUMNS, "users")},
+           IFNULL(todo_stats.total, 0) AS todo_count,
+           IFNULL(todo_stats.completed, 0) AS completed_count
+    FROM users LEFT JOIN todo_stats ON todo_stats.user_id = users.id"""
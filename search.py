@@ -0,0 +1,204 @@
+"""
+全文搜索
+待办的标题和描述建立 FTS5 外部内容索引（内容表为 todos 上的视图，不重复保存正文），
+由触发器与 todos 表保持同步；
+使用 trigram 分词器，中文等不以空格分词的文本也能按任意子串匹配。
+trigram 只能索引 3 个字符及以上的关键词，更短的关键词在已匹配的结果上用 LIKE 过滤，
+全部关键词都太短时退化为在当前用户的待办中按 LIKE 查找。
+管理后台的用户搜索同样使用 trigram 索引（用户名和邮箱）
+"""
+
+from repository import TODO_COLUMNS, Todo, column_list, select
+
+# trigram 分词器可索引的最短关键词长度
+MIN_TERM_LENGTH = 3
+# 单次搜索最多使用的关键词数
+MAX_TERMS = 8
+
+# 索引中的 rowid 为 (user_id << 32) | id，同一用户的待办在索引中连续存放，
+# 搜索时用 rowid 范围限定用户，只读取该用户的倒排记录（要求待办 ID 小于 2^32）
+TODO_SEARCH_STATEMENTS = [
+    """
+    CREATE VIEW IF NOT EXISTS todos_search_content AS
+    SELECT (user_id << 32) | id AS search_id, title, description FROM todos
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+        title, description,
+        content = 'todos_search_content', content_rowid = 'search_id',
+        tokenize = 'trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_fts_insert AFTER INSERT ON todos
+    BEGIN
+        INSERT INTO todos_fts (rowid, title, description)
+        VALUES ((NEW.user_id << 32) | NEW.id, NEW.title, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_fts_delete AFTER DELETE ON todos
+    BEGIN
+        INSERT INTO todos_fts (todos_fts, rowid, title, description)
+        VALUES ('delete', (OLD.user_id << 32) | OLD.id, OLD.title, OLD.description);
+    END
+    """,
+    # 只有标题、描述或所属用户变化时才更新索引，勾选完成不会触发
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_todos_fts_update
+    AFTER UPDATE OF title, description, user_id ON todos
+    BEGIN
+        INSERT INTO todos_fts (todos_fts, rowid, title, description)
+        VALUES ('delete', (OLD.user_id << 32) | OLD.id, OLD.title, OLD.description);
+        INSERT INTO todos_fts (rowid, title, description)
+        VALUES ((NEW.user_id << 32) | NEW.id, NEW.title, NEW.description);
+    END
+    """,
+]
+
+
+def create_todo_search(conn):
+    """
+    创建待办全文索引和同步触发器（幂等）
+    索引首次创建时根据已有待办重建
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'"
+    ).fetchone()
+    for statement in TODO_SEARCH_STATEMENTS:
+        conn.execute(statement)
+    if not exists:
+        conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')")
+
+
+def parse_terms(text):
+    """按空白拆分关键词，去重并限制数量"""
+    terms = []
+    for term in text.split():
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _match_expression(terms):
+    """每个关键词作为一个短语，全部出现才匹配"""
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_todos(conn, user_id, terms, limit, offset=0):
+    """
+    在用户的待办中搜索同时包含所有关键词的待办
+    标题中出现的关键词越多排名越靠前，相同时按创建时间倒序。
+    不使用 bm25：它的 IDF 需要遍历全表的倒排记录，开销随所有用户的待办总数增长
+    :return: 待办记录（Todo）列表
+    """
+    long_terms = [t for t in terms if len(t) >= MIN_TERM_LENGTH]
+    short_terms = [t for t in terms if len(t) < MIN_TERM_LENGTH]
+
+    conditions = []
+    params = []
+    for term in short_terms:
+        pattern = _like_pattern(term)
+        conditions.append(
+            "(todos.title LIKE ? ESCAPE '\\' OR todos.description LIKE ? ESCAPE '\\')"
+        )
+        params += [pattern, pattern]
+
+    title_hits = " + ".join(
+        "(instr(lower(todos.title), lower(?)) > 0)" for _ in terms
+    )
+    order = f"ORDER BY {title_hits} DESC, todos.created_at DESC, todos.id DESC"
+
+    columns = column_list(TODO_COLUMNS, "todos")
+    if long_terms:
+        query = f"""
+            SELECT {columns} FROM todos_fts
+            JOIN todos ON todos.id = (todos_fts.rowid & 4294967295)
+            WHERE todos_fts MATCH ? AND todos_fts.rowid BETWEEN ? AND ?
+        """
+        params = [
+            _match_expression(long_terms),
+            user_id << 32,
+            ((user_id + 1) << 32) - 1,
+            *params,
+        ]
+    else:
+        query = f"SELECT {columns} FROM todos WHERE todos.user_id = ?"
+        params = [user_id, *params]
+
+    query += "".join(f" AND {condition}" for condition in conditions)
+    query += f" {order} LIMIT ? OFFSET ?"
+    return select(conn, Todo, query, [*params, *terms, limit, offset]).fetchall()
+
+
+USER_SEARCH_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        username, email,
+        content = 'users', content_rowid = 'id',
+        tokenize = 'trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO users_fts (rowid, username, email)
+        VALUES (NEW.id, NEW.username, NEW.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+    BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, email)
+        VALUES ('delete', OLD.id, OLD.username, OLD.email);
+    END
+    """,
+    # 登录时间、提醒时间等字段的更新不触发
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_fts_update
+    AFTER UPDATE OF username, email ON users
+    BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, email)
+        VALUES ('delete', OLD.id, OLD.username, OLD.email);
+        INSERT INTO users_fts (rowid, username, email)
+        VALUES (NEW.id, NEW.username, NEW.email);
+    END
+    """,
+]
+
+
+def create_user_search(conn):
+    """
+    创建用户名和邮箱的全文索引及同步触发器（幂等）
+    索引首次创建时根据已有用户重建
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+    ).fetchone()
+    for statement in USER_SEARCH_STATEMENTS:
+        conn.execute(statement)
+    if not exists:
+        conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+
+def user_search_condition(text):
+    """
+    用户名或邮箱包含 text 的筛选条件
+    3 个字符及以上使用全文索引，更短时只能逐行 LIKE 匹配
+    :return: (SQL 条件, 参数列表)
+    """
+    if len(text) >= MIN_TERM_LENGTH:
+        return (
+            "users.id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)",
+            [_match_expression([text])],
+        )
+    pattern = _like_pattern(text)
+    return (
+        "(users.username LIKE ? ESCAPE '\\' OR users.email LIKE ? ESCAPE '\\')",
+        [pattern, pattern],
+    )
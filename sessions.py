@@ -0,0 +1,216 @@
+"""
+基于 SQLite 的服务器端会话存储
+会话保存在独立的 SQLite 数据库（WAL 模式）中，多个工作进程、共享数据卷的多个容器都能读取；
+每个进程维护一个 LRU 读缓存，命中时不查询数据库也不反序列化；
+过期会话由后台线程定期批量清理
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+from flask_session.base import ServerSideSession, ServerSideSessionInterface
+
+from db import ForkSafeWorker
+
+logger = logging.getLogger(__name__)
+
+SESSION_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    # 清理过期会话
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)",
+]
+
+
+def create_session_table(conn):
+    """创建会话表（幂等）"""
+    for statement in SESSION_STATEMENTS:
+        conn.execute(statement)
+
+
+class SQLiteSession(ServerSideSession):
+    pass
+
+
+class SQLiteSessionInterface(ForkSafeWorker, ServerSideSessionInterface):
+    """
+    SQLite 会话存储，接口与 Flask-Session 的其他后端一致
+    :param pool: 会话数据库的连接池
+    :param cache_size: 每个进程缓存的会话数
+    :param cache_ttl: 缓存条目的有效秒数；其他进程修改或删除的会话最多这么久后在本进程生效
+    :param gc_interval: 清理过期会话的间隔秒数
+    :param gc_batch_size: 每次删除的最大会话数，避免长时间持有写锁
+    """
+
+    session_class = SQLiteSession
+    thread_name = "session-gc"
+
+    def __init__(
+        self,
+        app,
+        pool,
+        key_prefix="session:",
+        use_signer=False,
+        permanent=True,
+        sid_length=32,
+        serialization_format="msgpack",
+        cache_size=10000,
+        cache_ttl=5,
+        gc_interval=300,
+        gc_batch_size=1000,
+    ):
+        self.pool = pool
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.gc_interval = gc_interval
+        self.gc_batch_size = gc_batch_size
+        # 缓存和清理线程不能跨 fork 复用，子进程中重建
+        self._register_fork_reset()
+
+        super().__init__(
+            app, key_prefix, use_signer, permanent, sid_length, serialization_format
+        )
+
+    def _reset(self):
+        """清空缓存并重置清理线程状态（fork 后在子进程中调用）"""
+        super()._reset()
+        # store_id -> (会话数据, 会话过期时间, 缓存过期时间)
+        self._cache = OrderedDict()
+
+    # ==================== 读缓存 ====================
+
+    def _cache_get(self, store_id):
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(store_id)
+            if entry is None:
+                return None
+            if entry[1] <= now or entry[2] <= now:
+                del self._cache[store_id]
+                return None
+            self._cache.move_to_end(store_id)
+            return entry
+
+    def _cache_put(self, store_id, data, expires_at):
+        with self._lock:
+            self._cache[store_id] = (data, expires_at, time.time() + self.cache_ttl)
+            self._cache.move_to_end(store_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_discard(self, store_id):
+        with self._lock:
+            self._cache.pop(store_id, None)
+
+    # ==================== 存储接口 ====================
+
+    def open_session(self, app, request):
+        self.start()
+        return super().open_session(app, request)
+
+    def should_set_storage(self, app, session):
+        """
+        未修改的会话只在剩余有效期不足一半时才续期写入，
+        避免 SESSION_REFRESH_EACH_REQUEST 让每个请求都写一次数据库
+        """
+        if session.modified:
+            return True
+        if not app.config["SESSION_REFRESH_EACH_REQUEST"]:
+            return False
+
+        entry = self._cache_get(self._get_store_id(session.sid))
+        if entry is None:
+            return True
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        return entry[1] - time.time() < lifetime / 2
+
+    def _retrieve_session_data(self, store_id):
+        entry = self._cache_get(store_id)
+        if entry is not None:
+            # 返回副本，请求中修改会话不影响缓存
+            return dict(entry[0])
+
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+                (store_id, time.time()),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        data = self.serializer.decode(row["data"])
+        self._cache_put(store_id, data, row["expires_at"])
+        return dict(data)
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        expires_at = time.time() + session_lifetime.total_seconds()
+        conn = self.pool.acquire()
+        try:
+            conn.execute(
+                """
+                INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    data = excluded.data,
+                    expires_at = excluded.expires_at
+                """,
+                (store_id, self.serializer.encode(session), expires_at),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self._cache_put(store_id, dict(session), expires_at)
+
+    def _delete_session(self, store_id):
+        self._cache_discard(store_id)
+        conn = self.pool.acquire()
+        try:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (store_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ==================== 过期清理 ====================
+
+    def _delete_expired_sessions(self):
+        """
+        分批删除已过期的会话
+        :return: 删除的会话数
+        """
+        deleted = 0
+        while True:
+            conn = self.pool.acquire()
+            try:
+                count = conn.execute(
+                    """
+                    DELETE FROM sessions WHERE id IN (
+                        SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?
+                    )
+                    """,
+                    (time.time(), self.gc_batch_size),
+                ).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            deleted += count
+            if count < self.gc_batch_size:
+                return deleted
+
+    def _run(self):
+        while True:
+            time.sleep(self.gc_interval)
+            try:
+                deleted = self._delete_expired_sessions()
+            except Exception as e:
+                logger.error(f"清理过期会话失败: {e}")
+            else:
+                if deleted:
+                    logger.info(f"已清理 {deleted} 个过期会话")
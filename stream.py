@@ -0,0 +1,143 @@
+"""
+待办变更推送
+每个工作进程只有一个轮询线程读取待办变更日志的当前序号，发现变化后通知本进程中
+对应用户的所有 SSE 连接；不同工作进程（以及共享数据库的多个容器）通过同一个数据库
+得到一致的变更，不需要额外的消息中间件。
+每个连接只保存最新的序号而不是事件队列，客户端处理得慢时多次变更自动合并为一次通知
+"""
+
+import logging
+import threading
+import time
+
+from db import ForkSafeWorker, get_change_seq
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """单个 SSE 连接的订阅，只保留尚未推送的最新序号"""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self._cond = threading.Condition()
+        self._seq = None
+
+    def notify(self, seq):
+        with self._cond:
+            if self._seq is None or seq > self._seq:
+                self._seq = seq
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """
+        等待新的变更
+        :return: 最新的变更序号，超时返回 None
+        """
+        with self._cond:
+            if self._seq is None:
+                self._cond.wait(timeout)
+            seq, self._seq = self._seq, None
+            return seq
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class ChangeBroker(ForkSafeWorker):
+    """
+    待办变更的进程内分发
+    :param pool: 数据库连接池
+    :param poll_interval: 轮询变更序号的间隔（秒），即推送的最大延迟
+    :param max_subscribers: 每个进程最多保持的连接数，超出时 subscribe 返回 None
+    """
+
+    thread_name = "change-broker"
+
+    def __init__(self, pool, poll_interval=0.5, max_subscribers=24):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        # 订阅和轮询线程不会随 fork 复制，子进程中重建
+        self._register_fork_reset()
+
+    def _reset(self):
+        super()._reset()
+        # user_id -> 该用户在本进程中的订阅集合
+        self._subscribers = {}
+        self._count = 0
+
+    def subscribe(self, user_id):
+        """
+        订阅用户的待办变更
+        :return: Subscription，连接数已满时返回 None
+        """
+        self.start()
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if not subscribers or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            self._count -= 1
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def poll(self, last_seq):
+        """
+        读取 last_seq 之后有变更的用户并通知其订阅
+        :return: 当前序号
+        """
+        conn = self.pool.acquire()
+        try:
+            seq = get_change_seq(conn)
+            if seq <= last_seq:
+                return seq
+            rows = conn.execute(
+                """
+                SELECT user_id, MAX(seq) FROM todo_changes
+                WHERE seq > ? AND seq <= ?
+                GROUP BY user_id
+                """,
+                (last_seq, seq),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            targets = [
+                (subscription, row[1])
+                for row in rows
+                for subscription in self._subscribers.get(row[0], ())
+            ]
+        for subscription, user_seq in targets:
+            subscription.notify(user_seq)
+        return seq
+
+    def _run(self):
+        last_seq = None
+        while True:
+            try:
+                if not self._subscribers:
+                    # 没有连接时不查询数据库，有新连接后从当前序号开始
+                    last_seq = None
+                elif last_seq is None:
+                    conn = self.pool.acquire()
+                    try:
+                        last_seq = get_change_seq(conn)
+                    finally:
+                        conn.close()
+                else:
+                    last_seq = self.poll(last_seq)
+            except Exception as e:
+                logger.error(f"读取待办变更失败: {e}")
+            time.sleep(self.poll_interval)
@@ -0,0 +1,89 @@
+"""
+测试公共夹具
+应用在导入时读取环境变量，因此先把数据库、会话和邮件配置指向临时目录，再导入 app
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="todolist-tests-")
+os.environ.update(
+    {
+        "DB_NAME": os.path.join(_tmp_dir, "todos.db"),
+        "SESSION_DB_NAME": os.path.join(_tmp_dir, "sessions.db"),
+        "MAIL_ENABLED": "False",
+        "MAIL_USERNAME": "",
+        "MAIL_PASSWORD": "",
+        # 测试只需要哈希格式正确，降低 scrypt 代价以加快注册和登录
+        "PASSWORD_HASH_N": "1024",
+    }
+)
+
+import app as todo_app  # noqa: E402
+
+_user_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def application():
+    """初始化数据库的应用模块（整个测试会话共用一个临时数据库）"""
+    todo_app.init_db()
+    yield todo_app
+    todo_app.smtp_pool.close_all()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def db_conn(application):
+    """从连接池借出的连接，测试结束后归还"""
+    conn = application.db_pool.acquire()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def new_user(application):
+    """
+    注册一个新用户并返回 (已登录的测试客户端, 用户信息)
+    每次调用使用不同的用户名和邮箱，测试之间的数据互不影响
+    """
+
+    def factory():
+        n = next(_user_ids)
+        client = application.app.test_client()
+        info = {
+            "username": f"user{n}",
+            "password": "secret123",
+            "email": f"user{n}@example.com",
+        }
+        response = client.post("/api/register", json=info)
+        assert response.status_code == 201
+        info["id"] = response.get_json()["id"]
+
+        response = client.post(
+            "/api/login",
+            json={"username": info["username"], "password": info["password"]},
+        )
+        assert response.status_code == 200
+        return client, info
+
+    return factory
+
+
+@pytest.fixture
+def client(new_user):
+    """已登录的普通用户测试客户端"""
+    return new_user()[0]
+
+
+@pytest.fixture
+def admin_client(new_user, db_conn):
+    """已登录的管理员测试客户端"""
+    client, user = new_user()
+    db_conn.execute("UPDATE users SET is_admin = 1 WHERE id = ?", (user["id"],))
+    db_conn.commit()
+    return client
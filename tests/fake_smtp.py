@@ -0,0 +1,67 @@
+"""
+测试用的最小 SMTP 服务器
+在本地端口上接收邮件并保存在内存中，只实现 smtplib 发送邮件用到的命令（不支持 STARTTLS 和 AUTH）
+"""
+
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost fake smtp")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line == b".\r\n":
+                        break
+                    # 去掉点填充
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                self.server.messages.append(
+                    message_from_bytes(b"".join(lines), policy=policy.default)
+                )
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                # MAIL / RCPT / RSET / NOOP
+                self.reply("250 OK")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    :attr messages: 收到的邮件（email.message.EmailMessage）列表
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.messages = []
+        self.port = self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def sent_to(self, email):
+        """发给指定收件人的邮件"""
+        return [msg for msg in self.messages if msg["To"] == email]
@@ -0,0 +1,32 @@
+"""管理后台用户搜索"""
+
+
+def test_search_total_is_counted_once(application, admin_client, db_conn):
+    db_conn.executemany(
+        """
+        INSERT INTO users (username, password, email, created_at)
+        VALUES (?, 'x', ?, ?)
+        """,
+        [
+            (f"findme{i}", f"findme{i}@example.com", f"2024-01-01 00:00:{i:02d}")
+            for i in range(25)
+        ],
+    )
+    db_conn.commit()
+
+    first = admin_client.get("/api/admin/users?search=findme&limit=10").get_json()
+    assert first["total"] == 25
+    assert first["estimated"] is False
+
+    seen = [user["username"] for user in first["users"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = admin_client.get(
+            f"/api/admin/users?search=findme&limit=10&cursor={cursor}"
+        ).get_json()
+        # 翻页时不再返回逐页减少的计数
+        assert page["total"] is None
+        seen += [user["username"] for user in page["users"]]
+        cursor = page["next_cursor"]
+
+    assert seen == [f"findme{i}" for i in reversed(range(25))]
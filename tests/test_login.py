@@ -0,0 +1,56 @@
+"""登录时升级旧版密码哈希"""
+
+import hashlib
+
+import pytest
+
+from passwords import PasswordHasherBusy
+
+
+@pytest.fixture
+def legacy_user(new_user, db_conn):
+    """密码为旧版无盐 SHA-256 哈希的用户"""
+    client, user = new_user()
+    legacy = hashlib.sha256(user["password"].encode()).hexdigest()
+    db_conn.execute(
+        "UPDATE users SET password = ? WHERE id = ?", (legacy, user["id"])
+    )
+    db_conn.commit()
+    return user, legacy
+
+
+def stored_password(conn, user_id):
+    row = conn.execute("SELECT password FROM users WHERE id = ?", (user_id,))
+    return row.fetchone()[0]
+
+
+def login(application, user):
+    return application.app.test_client().post(
+        "/api/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+
+
+def test_legacy_hash_is_upgraded(application, legacy_user, db_conn):
+    user, legacy = legacy_user
+
+    assert login(application, user).status_code == 200
+
+    stored = stored_password(db_conn, user["id"])
+    assert stored != legacy
+    assert not application.password_hasher.needs_rehash(stored)
+
+
+def test_login_succeeds_when_hasher_is_busy(
+    application, legacy_user, db_conn, monkeypatch
+):
+    user, legacy = legacy_user
+
+    def busy(password):
+        raise PasswordHasherBusy()
+
+    monkeypatch.setattr(application, "hash_password", busy)
+
+    assert login(application, user).status_code == 200
+    # 本次不升级，下次登录再升级
+    assert stored_password(db_conn, user["id"]) == legacy
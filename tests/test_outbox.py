@@ -0,0 +1,35 @@
+"""发件箱保留期清理"""
+
+import time
+
+from outbox import compact_outbox
+
+
+def insert_email(conn, status, sent_at):
+    now = time.time()
+    return conn.execute(
+        """
+        INSERT INTO email_outbox
+            (to_email, subject, html_content, status, next_attempt_at, created_at, sent_at)
+        VALUES ('a@example.com', 's', 'h', ?, ?, ?, ?)
+        """,
+        (status, now, now, sent_at),
+    ).lastrowid
+
+
+def test_only_old_sent_emails_are_purged(db_conn):
+    old = time.time() - 10 * 86400
+    purged = insert_email(db_conn, "sent", old)
+    kept = [
+        insert_email(db_conn, "sent", time.time()),
+        insert_email(db_conn, "dead", None),
+        insert_email(db_conn, "pending", None),
+    ]
+    db_conn.commit()
+
+    assert compact_outbox(db_conn, time.time() - 7 * 86400) >= 1
+    db_conn.commit()
+
+    remaining = {row[0] for row in db_conn.execute("SELECT id FROM email_outbox")}
+    assert purged not in remaining
+    assert set(kept) <= remaining
@@ -0,0 +1,13 @@
+"""热点查询的执行计划"""
+
+import db
+
+
+def test_hot_queries_use_expected_indexes(db_conn):
+    assert db.check_query_plans(db_conn) == []
+
+
+def test_full_scan_is_reported(db_conn):
+    query = "SELECT id FROM todos WHERE description = ?"
+    problems = db.check_query_plans(db_conn, [(query, ("x",), None)])
+    assert [sql for sql, _ in problems] == [query]
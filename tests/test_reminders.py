@@ -0,0 +1,139 @@
+"""提醒邮件投递（发送到本地的测试 SMTP 服务器）"""
+
+import time
+from datetime import datetime
+
+import pytest
+
+from fake_smtp import FakeSMTPServer
+
+
+@pytest.fixture
+def smtp_server(application, monkeypatch):
+    """启用邮件服务并把 SMTP 会话池指向测试服务器"""
+    server = FakeSMTPServer()
+    server.start()
+
+    config = application.Config
+    monkeypatch.setattr(config, "MAIL_ENABLED", True)
+    monkeypatch.setattr(config, "MAIL_USERNAME", "sender@example.com")
+    monkeypatch.setattr(config, "MAIL_PASSWORD", "secret")
+    pool = application.smtp_pool
+    monkeypatch.setattr(pool, "host", "127.0.0.1")
+    monkeypatch.setattr(pool, "port", server.port)
+    monkeypatch.setattr(pool, "use_tls", False)
+
+    yield server
+
+    pool.close_all()
+    server.stop()
+
+
+def reminder_slot(conn, user_id):
+    value = conn.execute(
+        "SELECT next_reminder_at FROM users WHERE id = ?", (user_id,)
+    ).fetchone()[0]
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def test_due_reminder_is_sent_once(application, new_user, db_conn, smtp_server):
+    client, user = new_user()
+    client.post("/api/todos", json={"title": "写周报"})
+    slot = reminder_slot(db_conn, user["id"])
+
+    application.send_reminder_emails(now=slot)
+
+    messages = smtp_server.sent_to(user["email"])
+    assert len(messages) == 1
+    assert messages[0]["Subject"] == f"待办事项提醒 - {slot:%Y-%m-%d %H:%M}"
+    assert "写周报" in messages[0].get_body(("html",)).get_content()
+
+    status = db_conn.execute(
+        "SELECT status FROM reminder_ledger WHERE user_id = ? AND slot = ?",
+        (user["id"], f"{slot:%Y-%m-%d %H:%M:%S}"),
+    ).fetchone()[0]
+    assert status == "sent"
+    # 已推进到下一个时段
+    assert reminder_slot(db_conn, user["id"]) > slot
+
+    # 同一时段再次运行不会重发
+    application.send_reminder_emails(now=slot)
+    assert len(smtp_server.sent_to(user["email"])) == 1
+
+
+def test_user_without_open_todos_is_skipped(
+    application, new_user, db_conn, smtp_server
+):
+    _, user = new_user()
+    slot = reminder_slot(db_conn, user["id"])
+
+    application.send_reminder_emails(now=slot)
+
+    assert smtp_server.sent_to(user["email"]) == []
+    status = db_conn.execute(
+        "SELECT status FROM reminder_ledger WHERE user_id = ?", (user["id"],)
+    ).fetchone()[0]
+    assert status == "skipped"
+
+
+class LostLease:
+    """续约总是失败的租约（已被其他进程接管）"""
+
+    def try_acquire(self):
+        return False
+
+
+def test_nothing_is_sent_after_losing_the_lease(
+    application, new_user, db_conn, smtp_server
+):
+    client, user = new_user()
+    client.post("/api/todos", json={"title": "写周报"})
+    slot = reminder_slot(db_conn, user["id"])
+
+    application.send_reminder_emails(now=slot, lease=LostLease())
+
+    assert smtp_server.sent_to(user["email"]) == []
+    assert reminder_slot(db_conn, user["id"]) == slot
+
+
+def claim_by_other_worker(conn, user_id, slot, claimed_at):
+    """模拟另一个进程已领取该时段：写入 sending 记录并推进用户的下一个时段"""
+    slot_str = f"{slot:%Y-%m-%d %H:%M:%S}"
+    conn.execute(
+        """
+        INSERT INTO reminder_ledger
+            (user_id, slot, status, created_at, claimed_by, claimed_at)
+        VALUES (?, ?, 'sending', ?, 'other-host:1', ?)
+        """,
+        (user_id, slot_str, slot_str, claimed_at),
+    )
+    conn.execute(
+        "UPDATE users SET next_reminder_at = '2999-01-01 00:00:00' WHERE id = ?",
+        (user_id,),
+    )
+    conn.commit()
+
+
+def test_reminder_claimed_by_another_worker_is_not_sent(
+    application, new_user, db_conn, smtp_server
+):
+    client, user = new_user()
+    client.post("/api/todos", json={"title": "写周报"})
+    slot = reminder_slot(db_conn, user["id"])
+    claim_by_other_worker(db_conn, user["id"], slot, time.time())
+
+    application.send_reminder_emails(now=slot)
+
+    assert smtp_server.sent_to(user["email"]) == []
+
+
+def test_stale_claim_is_recovered(application, new_user, db_conn, smtp_server):
+    client, user = new_user()
+    client.post("/api/todos", json={"title": "写周报"})
+    slot = reminder_slot(db_conn, user["id"])
+    stale = time.time() - application.Config.OUTBOX_CLAIM_TIMEOUT - 1
+    claim_by_other_worker(db_conn, user["id"], slot, stale)
+
+    application.send_reminder_emails(now=slot)
+
+    assert len(smtp_server.sent_to(user["email"])) == 1
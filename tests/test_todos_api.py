@@ -0,0 +1,187 @@
+"""待办接口：键集分页、ETag / If-Match 和批量接口"""
+
+
+def create_todos(client, count):
+    """通过批量接口创建待办，返回按创建顺序排列的 ID"""
+    response = client.post(
+        "/api/todos/batch",
+        json={
+            "operations": [{"op": "create", "title": f"待办 {i}"} for i in range(count)]
+        },
+    )
+    assert response.status_code == 200
+    return [result["todo"]["id"] for result in response.get_json()["results"]]
+
+
+def test_keyset_pages_cover_list_once(client):
+    ids = create_todos(client, 7)
+
+    seen = []
+    cursor = ""
+    while True:
+        body = client.get(f"/api/todos?view=all&limit=3&cursor={cursor}").get_json()
+        assert len(body["todos"]) <= 3
+        seen += [todo["id"] for todo in body["todos"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    # 同一秒内创建的待办按 ID 倒序
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/api/todos?cursor=not-a-cursor").status_code == 400
+
+
+def test_list_etag_revalidation(client):
+    create_todos(client, 1)
+
+    first = client.get("/api/todos?view=all")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = client.get("/api/todos?view=all", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    create_todos(client, 1)
+    changed = client.get("/api/todos?view=all", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_update_with_if_match(client):
+    (todo_id,) = create_todos(client, 1)
+
+    response = client.put(
+        f"/api/todos/{todo_id}", json={"completed": True}, headers={"If-Match": '"1"'}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert response.get_json()["completed"] is True
+
+    # 版本号已过期，不覆盖
+    stale = client.put(
+        f"/api/todos/{todo_id}", json={"title": "旧版本"}, headers={"If-Match": '"1"'}
+    )
+    assert stale.status_code == 412
+
+    missing = client.put("/api/todos/999999", json={"completed": True})
+    assert missing.status_code == 404
+
+
+def test_batch_results_in_request_order(client, new_user):
+    keep, remove = create_todos(client, 2)
+    other_client, _ = new_user()
+    (foreign,) = create_todos(other_client, 1)
+
+    response = client.post(
+        "/api/todos/batch",
+        json={
+            "operations": [
+                {"op": "create", "title": " 新待办 ", "description": "说明"},
+                {"op": "update", "id": keep, "completed": True},
+                {"op": "delete", "id": remove},
+                {"op": "update", "id": remove, "title": "已删除"},
+                {"op": "delete", "id": foreign},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["status"] for result in results] == [201, 200, 200, 404, 404]
+    assert results[0]["todo"]["title"] == "新待办"
+    assert results[1]["todo"]["completed"] is True
+
+    # 其他用户的待办不受影响
+    body = other_client.get("/api/todos?view=all").get_json()
+    assert [todo["id"] for todo in body["todos"]] == [foreign]
+
+
+def test_batch_with_invalid_operation_is_not_applied(client):
+    (todo_id,) = create_todos(client, 1)
+
+    response = client.post(
+        "/api/todos/batch",
+        json={
+            "operations": [
+                {"op": "delete", "id": todo_id},
+                {"op": "update", "id": todo_id, "title": ""},
+            ]
+        },
+    )
+    assert response.status_code == 400
+    assert response.get_json()["results"] == [
+        {"index": 1, "status": 400, "error": "标题不能为空"}
+    ]
+
+    body = client.get("/api/todos?view=all").get_json()
+    assert [todo["id"] for todo in body["todos"]] == [todo_id]
+
+
+def test_batch_size_limit(application, client):
+    operations = [{"op": "create", "title": "x"}] * (
+        application.BATCH_MAX_OPERATIONS + 1
+    )
+    response = client.post("/api/todos/batch", json={"operations": operations})
+    assert response.status_code == 400
+
+
+def test_update_rejects_invalid_fields_like_batch(client):
+    (todo_id,) = create_todos(client, 1)
+
+    for body, error in [
+        ({"title": None}, "标题不能为空"),
+        ({"title": "   "}, "标题不能为空"),
+        ({"description": 1}, "描述格式错误"),
+        ({}, "没有需要更新的字段"),
+    ]:
+        response = client.put(f"/api/todos/{todo_id}", json=body)
+        assert response.status_code == 400
+        assert response.get_json() == {"error": error}
+
+        batch = client.post(
+            "/api/todos/batch",
+            json={"operations": [{"op": "update", "id": todo_id, **body}]},
+        )
+        assert batch.status_code == 400
+        assert batch.get_json()["results"][0]["error"] == error
+
+
+def test_list_etag_depends_on_query(client):
+    ids = create_todos(client, 3)
+    client.put(f"/api/todos/{ids[0]}", json={"completed": True})
+
+    cursor = client.get("/api/todos?view=all&limit=1").get_json()["next_cursor"]
+    urls = [
+        "/api/todos",
+        "/api/todos?view=all",
+        "/api/todos?view=all&limit=1",
+        f"/api/todos?view=all&limit=1&cursor={cursor}",
+    ]
+    etags = [client.get(url).headers["ETag"] for url in urls]
+    assert len(set(etags)) == len(urls)
+
+    # 其他查询的 ETag 不会让本查询返回 304
+    response = client.get(urls[1], headers={"If-None-Match": etags[0]})
+    assert response.status_code == 200
+
+
+def test_search_etag_depends_on_query(client):
+    client.post("/api/todos", json={"title": "买牛奶和面包"})
+    client.post("/api/todos", json={"title": "写周报"})
+
+    milk = client.get("/api/todos/search?q=牛奶")
+    report = client.get(
+        "/api/todos/search?q=周报", headers={"If-None-Match": milk.headers["ETag"]}
+    )
+    assert report.status_code == 200
+    assert report.headers["ETag"] != milk.headers["ETag"]
+    assert [todo["title"] for todo in report.get_json()["todos"]] == ["写周报"]
+
+    cached = client.get(
+        "/api/todos/search?q=牛奶", headers={"If-None-Match": milk.headers["ETag"]}
+    )
+    assert cached.status_code == 304